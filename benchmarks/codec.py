@@ -0,0 +1,81 @@
+"""
+Encode/decode cost of websocket protocol messages per JSON codec.
+
+    python -m benchmarks.codec [accounts]
+
+Per account the node sends PING and PONG about every 2 minutes and AUTH on every (re)connect,
+HTTP_REQUEST jobs are rarer but carry base64 body. Fleet numbers are CPU seconds per hour.
+"""
+import base64
+import os
+import sys
+import timeit
+import uuid
+
+from core.grass_sdk.codec import JsonCodec, OrjsonCodec, orjson
+
+body = base64.b64encode(os.urandom(64 * 1024)).decode('ascii')
+
+messages = {
+    "AUTH": {
+        "id": str(uuid.uuid4()),
+        "origin_action": "AUTH",
+        "result": {
+            "browser_id": str(uuid.uuid4()),
+            "user_id": "2oZt3uHcBpz8mTfqJ2n8W4gY7kL",
+            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                          "Chrome/120.0.0.0 Safari/537.36",
+            "timestamp": 1700000000,
+            "device_type": "desktop",
+            "version": "4.30.0",
+        }
+    },
+    "PING": {"id": str(uuid.uuid4()), "version": "1.0.0", "action": "PING", "data": {}},
+    "PONG": {"id": str(uuid.uuid4()), "origin_action": "PONG"},
+    "HTTP_REQUEST": {
+        "id": str(uuid.uuid4()),
+        "origin_action": "HTTP_REQUEST",
+        "result": {
+            "body": body,
+            "headers": {"content-type": "text/html; charset=utf-8", "cache-control": "max-age=60"},
+            "status": 200,
+            "status_text": "OK",
+            "url": "https://example.com/",
+        }
+    },
+}
+
+# messages per account per hour
+rates = {"AUTH": 1, "PING": 30, "PONG": 30, "HTTP_REQUEST": 5}
+
+
+def measure(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main(accounts: int = 10_000):
+    codecs = [JsonCodec()] + ([OrjsonCodec()] if orjson else [])
+
+    print(f"{'codec':<8} {'message':<13} {'encode, us':>11} {'decode, us':>11} {'fleet, cpu s/h':>15}")
+    for codec in codecs:
+        fleet_total = 0
+        for name, message in messages.items():
+            number = 200 if name == "HTTP_REQUEST" else 20_000
+            encoded = codec.dumps(message)
+
+            encode_time = measure(lambda: codec.dumps(message), number)
+            decode_time = measure(lambda: codec.loads(encoded), number)
+
+            fleet_time = (encode_time + decode_time) * rates[name] * accounts
+            fleet_total += fleet_time
+
+            print(f"{codec.name:<8} {name:<13} {encode_time * 1e6:>11.2f} {decode_time * 1e6:>11.2f} "
+                  f"{fleet_time:>15.2f}")
+        print(f"{codec.name:<8} {'total':<13} {'':>11} {'':>11} {fleet_total:>15.2f}")
+
+    if not orjson:
+        print("orjson is not installed, only stdlib codec measured")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,52 @@
+"""
+Identities per second: old Person() with RandomNicknames + names per call vs IdentityFactory in bulk.
+
+    python -m benchmarks.identity [identities]
+
+Old path reads nickname and name lists from disk on every call, so it is timed on a sample and scaled.
+"""
+import random
+import sys
+import time
+
+import names
+from random_words import RandomNicknames
+
+from core.utils.generate.identity import IdentityFactory
+from core.utils.generate.person import Person
+
+
+def old_identity() -> tuple:
+    username = RandomNicknames().random_nick(gender=random.choice(['f', 'm'])).lower() + \
+               Person.random_string_old(random.randint(1, 5)) + str(random.randint(1, 999))
+    first_name, last_name = names.get_full_name().split(" ")
+    email = f"{username[:-random.choice(range(1, 3))].lower()}@{random.choice(['gmail.com', 'outlook.com', 'yahoo.com'])}"
+    return username, first_name, last_name, email, Person.random_string(8)
+
+
+def main(count: int = 100_000):
+    sample = min(count, 300)
+    started_at = time.perf_counter()
+    for _ in range(sample):
+        old_identity()
+    old_per_second = sample / (time.perf_counter() - started_at)
+
+    factory = IdentityFactory()
+    started_at = time.perf_counter()
+    factory.load()
+    load_time = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    identities = factory.identities(count)
+    new_per_second = count / (time.perf_counter() - started_at)
+
+    assert len(identities) == count and all(identity.username and identity.last_name for identity in identities)
+    print(f"{'path':<22} {'identities/s':>13} {f'{count} in, s':>12}")
+    print(f"{'Person() per call':<22} {old_per_second:>13,.0f} {count / old_per_second:>12.1f}")
+    print(f"{'IdentityFactory bulk':<22} {new_per_second:>13,.0f} {count / new_per_second + load_time:>12.2f}")
+    print(f"one-time corpus load: {load_time * 1000:.0f} ms, "
+          f"{len(set(identity.username for identity in identities)) / count:.2%} unique usernames")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
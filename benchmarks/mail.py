@@ -0,0 +1,109 @@
+"""
+Bytes fetched and CPU per verification mail: whole message + MailMessage.html vs headers, BODYSTRUCTURE and html part only.
+
+    python -m benchmarks.mail [accounts]
+
+Mail is built like the real one: html and text alternatives, quoted-printable, plus inline logo.
+"""
+import base64
+import os
+import sys
+import timeit
+from email.charset import QP, Charset
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from bs4 import BeautifulSoup
+from imap_tools import MailMessage
+
+from core.grass_sdk.website import EMAIL_TOKEN_RE
+from core.utils.mail.aioimap import parse_response
+from core.utils.mail.mailbox import HEADER_FIELDS, MailHeaders, decode_part, html_to_text
+
+token = base64.urlsafe_b64encode(os.urandom(96)).decode().rstrip("=")
+style = "<style>" + ".c{font-family:Arial,sans-serif;color:#1e1e1e;padding:12px}" * 150 + "</style>"
+html_body = (f"<html><head>{style}</head><body><div class=c><p>Please verify your email address.</p>"
+             f'<a href="https://app.getgrass.io/verify-email/token={token}/">Verify email</a>'
+             + "<p>If you did not request this, ignore this message.</p>" * 40 + "</div></body></html>")
+text_body = f"Please verify your email address: https://app.getgrass.io/verify-email/token={token}/\n"
+
+
+def build_message() -> bytes:
+    message = MIMEMultipart("related")
+    message["Subject"] = "Verify Your Email for Grass"
+    message["From"] = "Grass <no-reply@grassfoundation.io>"
+    message["To"] = "user@example.com"
+
+    charset = Charset("utf-8")
+    charset.body_encoding = QP  # like real mail
+
+    alternative = MIMEMultipart("alternative")
+    alternative.attach(MIMEText(text_body, "plain", charset))
+    alternative.attach(MIMEText(html_body, "html", charset))
+    message.attach(alternative)
+    message.attach(MIMEImage(os.urandom(24 * 1024), "png"))
+
+    return message.as_bytes()
+
+
+def bodystructure(part) -> str:
+    # what server answers for BODYSTRUCTURE of message
+    if part.is_multipart():
+        children = "".join(bodystructure(child) for child in part.get_payload())
+        return f'({children} "{part.get_content_subtype().upper()}" ("BOUNDARY" "{part.get_boundary()}") NIL NIL)'
+
+    content_type, subtype = part.get_content_type().upper().split("/")
+    payload = part.get_payload()
+    return (f'("{content_type}" "{subtype}" ("CHARSET" "{part.get_content_charset() or "us-ascii"}") NIL NIL '
+            f'"{part["Content-Transfer-Encoding"].upper()}" {len(payload)} {payload.count(chr(10))})')
+
+
+raw = build_message()
+parsed = MailMessage.from_bytes(raw).obj
+header_data = b"".join(f"{key}: {value}\r\n".encode() for key, value in parsed.items()
+                       if key.upper() in HEADER_FIELDS) + b"\r\n"
+structure_line = f"* 1 FETCH (UID 1 BODYSTRUCTURE {bodystructure(parsed)})".encode()
+html_part = parsed.get_payload()[0].get_payload()[1].get_payload().encode()
+
+
+def before() -> str:
+    html = MailMessage([(b"1 (UID 1 BODY[] {%d}" % len(raw), raw), b")"]).html
+    return html.split('token=')[1].split('/')[0]
+
+
+def before_text() -> str:
+    return BeautifulSoup(MailMessage.from_bytes(raw).html, "html.parser").get_text()
+
+
+def after() -> str:
+    structure = parse_response([structure_line])[3][3]
+    headers = MailHeaders("1", header_data, structure)
+    section, _, params, encoding = headers.find_part("text/html", "text/plain")
+    return EMAIL_TOKEN_RE.search(decode_part(html_part, encoding, params.get("charset"))).group(1)
+
+
+def after_text() -> str:
+    return html_to_text(decode_part(html_part, "quoted-printable", "utf-8"))
+
+
+def measure(func, number: int = 300) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main(accounts: int = 10_000):
+    assert before() == after() == token
+    assert " ".join(before_text().split()) == " ".join(after_text().split())
+
+    bytes_before = len(raw)
+    bytes_after = len(header_data) + len(structure_line) + len(html_part)
+
+    print(f"{'path':<22} {'bytes':>8} {'token, us':>10} {'text, us':>9}")
+    print(f"{'whole message':<22} {bytes_before:>8} {measure(before) * 1e6:>10.1f} {measure(before_text) * 1e6:>9.1f}")
+    print(f"{'headers + html part':<22} {bytes_after:>8} {measure(after) * 1e6:>10.1f} {measure(after_text) * 1e6:>9.1f}")
+    print(f"{accounts} verifications: {bytes_before * accounts / 2 ** 20:.1f} -> "
+          f"{bytes_after * accounts / 2 ** 20:.1f} MB fetched")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,74 @@
+"""
+Cost of building PING/PONG/AUTH frames: dict + uuid4 + json encode vs precompiled templates.
+
+    python -m benchmarks.messages [accounts]
+
+Fleet numbers are CPU seconds per hour, every account sends PING and PONG about every 2 minutes
+and AUTH on every (re)connect.
+"""
+import sys
+import time
+import timeit
+import uuid
+
+from core.grass_sdk.codec import codec
+from core.grass_sdk.messages import MessageIdGenerator, MessageTemplates
+
+node_type = "2x"
+browser_id = str(uuid.uuid4())
+user_id = "2oZt3uHcBpz8mTfqJ2n8W4gY7kL"
+user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) " \
+             "Chrome/120.0.0.0 Safari/537.36"
+connection_id = str(uuid.uuid4())
+
+templates = MessageTemplates(node_type)
+
+cases = {
+    "PING": (
+        lambda: codec.dumps({"id": str(uuid.uuid4()), "version": "1.0.0", "action": "PING", "data": {}}),
+        templates.ping_message,
+    ),
+    "PONG": (
+        lambda: codec.dumps({"id": connection_id, "origin_action": "PONG"}),
+        lambda: templates.pong_message(connection_id),
+    ),
+    "AUTH": (
+        lambda: codec.dumps(MessageTemplates.auth_message_dict(node_type, connection_id, browser_id, user_id,
+                                                               user_agent, int(time.time()))),
+        lambda: templates.auth_message(connection_id, browser_id, user_id, user_agent),
+    ),
+    "id": (
+        lambda: str(uuid.uuid4()),
+        MessageIdGenerator(),
+    ),
+}
+
+# messages per account per hour
+rates = {"PING": 30, "PONG": 30, "AUTH": 1}
+
+
+def measure(func, number: int = 50_000) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main(accounts: int = 10_000):
+    print(f"codec: {codec.name}")
+    print(f"{'message':<8} {'dict, us':>9} {'template, us':>13} {'speedup':>8}")
+
+    fleet_before = fleet_after = 0
+    for name, (before, after) in cases.items():
+        before_time, after_time = measure(before), measure(after)
+        print(f"{name:<8} {before_time * 1e6:>9.2f} {after_time * 1e6:>13.2f} {before_time / after_time:>7.1f}x")
+
+        if name in rates:
+            fleet_before += before_time * rates[name] * accounts
+            fleet_after += after_time * rates[name] * accounts
+
+    print(f"{accounts} accounts: {fleet_before:.2f} -> {fleet_after:.2f} cpu s/h")
+
+    ids = MessageIdGenerator()
+    assert len({ids() for _ in range(100_000)}) == 100_000
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,102 @@
+import asyncio
+import random
+from typing import List, Optional, Tuple
+
+from core.autoreger import AutoReger
+from core.grass import Grass
+from core.pipeline import Pipeline, Stage
+from core.utils import logger
+from data.config import settings
+
+
+class ApproveJob:
+    def __init__(self, account: tuple):
+        # account as given by AutoReger: (id, "email 🚀 password 🚀 imap_pass", proxy, wallet, db)
+        self.account = account
+        self.id, line, self.proxy, self.wallet, self.db = account
+
+        consumables = line.split(" 🚀 ")[:3]
+        if settings.SINGLE_IMAP_ACCOUNT:
+            consumables.append(settings.SINGLE_IMAP_ACCOUNT.split(" 🚀 ")[1])
+
+        self.email = consumables[0]
+        self.password = consumables[1] if len(consumables) > 1 else None
+        self.imap_pass = consumables[2] if len(consumables) > 2 else None
+
+        self.grass: Optional[Grass] = None
+        # (mail subject, confirm endpoint) of verification mails sent in first phase
+        self.pending: List[Tuple[str, str]] = []
+
+    def __str__(self):
+        return f"{self.id} | {self.email}"
+
+    def require_imap_pass(self):
+        if settings.SEMI_AUTOMATIC_APPROVE_LINK:
+            self.imap_pass = "placeholder"
+        elif self.imap_pass is None:
+            raise TypeError("IMAP password is not provided")
+
+
+async def send_verifications(job: ApproveJob) -> Optional[ApproveJob]:
+    # first phase: login, link wallet and ask site to send all verification mails, no waiting for mail
+    await asyncio.sleep(random.uniform(*settings.REGISTER_DELAY))
+    logger.info(f"Starting #{job.id} | {job.email} | {job.proxy}")
+
+    job.grass = grass = Grass(job.id, job.email, job.password, job.proxy, job.db)
+    await grass.enter_account()
+    user_info = (await grass.retrieve_user())['result']['data']
+
+    if settings.APPROVE_EMAIL:
+        if user_info.get("isVerified"):
+            logger.info(f"{grass.id} | {grass.email} email already verified!")
+        else:
+            job.require_imap_pass()
+            await grass.send_approve_link(endpoint="sendEmailVerification")
+            job.pending.append(("Verify Your Email for Grass", "confirmEmail"))
+
+    if settings.CONNECT_WALLET:
+        if user_info.get("walletAddress"):
+            logger.info(f"{grass.id} | {grass.email} wallet already linked!")
+        else:
+            await grass.link_wallet(job.wallet)
+
+    if user_info.get("isWalletAddressVerified"):
+        logger.info(f"{grass.id} | {grass.email} wallet already verified!")
+    else:
+        if settings.SEND_WALLET_APPROVE_LINK_TO_EMAIL:
+            await grass.send_approve_link(endpoint="sendWalletAddressEmailVerification")
+        if settings.APPROVE_WALLET_ON_EMAIL:
+            job.require_imap_pass()
+            job.pending.append(("Verify Your Wallet Address for Grass", "confirmWalletAddress"))
+
+    return job if job.pending else None
+
+
+async def harvest_verifications(job: ApproveJob) -> ApproveJob:
+    # second phase: mails were sent for whole batch, so most of them are already in mailbox
+    for subject, endpoint in job.pending:
+        await job.grass.approve_email(job.imap_pass, email_subject=subject, endpoint=endpoint)
+        logger.info(f"{job.grass.id} | {job.grass.email} {endpoint} done!")
+
+    return job
+
+
+async def approve_accounts(accounts: List[tuple]) -> int:
+    success = 0
+
+    async def on_done(job: ApproveJob, is_success: bool):
+        nonlocal success
+        success += int(is_success)
+
+        if job.grass:
+            await job.grass.session.close()
+        AutoReger.logs(job.id, job.account, is_success)
+
+    pipeline = Pipeline(
+        Stage("send", send_verifications, settings.APPROVE_SEND_THREADS),
+        Stage("harvest", harvest_verifications, settings.APPROVE_HARVEST_THREADS),
+        on_done=on_done,
+    )
+    await pipeline.run(ApproveJob(account) for account in accounts)
+
+    return success
@@ -2,6 +2,7 @@ import random
 import traceback
 from asyncio import Semaphore, sleep, create_task, wait
 from itertools import zip_longest
+from typing import Awaitable, Callable
 
 from core.utils import logger, file_to_list, str_to_file
 
@@ -49,6 +50,17 @@ class AutoReger:
         self.delay = delay
         await self.define_tasks(worker_func)
 
+        self.log_summary()
+
+    async def start_pipeline(self, pipeline_func: Callable[[list], Awaitable[int]]):
+        # pipeline_func handles all accounts itself and returns count of successful ones
+        logger.info(f"Successfully grabbed {len(self.accounts)} accounts")
+
+        self.success = await pipeline_func(self.accounts)
+
+        self.log_summary()
+
+    def log_summary(self):
         (logger.success if self.success else logger.warning)(
                    f"Successfully handled {self.success} accounts :)" if self.success
                    else "No accounts handled :( | Check logs in logs/out.log")
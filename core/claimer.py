@@ -0,0 +1,60 @@
+from collections import Counter
+from typing import List, Optional
+
+from core.autoreger import AutoReger
+from core.grass import Grass
+from core.pipeline import Pipeline, Stage
+from core.utils import logger
+from core.utils.rate_limiter import TokenBucket
+from data.config import settings
+
+# shared by all accounts: logins and claims of whole fleet go at steady rate instead of per account sleeps
+claim_budget = TokenBucket(settings.CLAIM_RATE, settings.CLAIM_BURST)
+
+
+class ClaimJob:
+    def __init__(self, account: tuple):
+        # account as given by AutoReger: (id, "email 🚀 password", proxy, wallet, db)
+        self.account = account
+        self.id, line, self.proxy, self.wallet, self.db = account
+        self.email, self.password = (line.split(" 🚀 ") + [None])[:2]
+
+        self.grass: Optional[Grass] = None
+        self.claimed = 0
+
+    def __str__(self):
+        return f"{self.id} | {self.email}"
+
+
+async def claim_rewards(job: ClaimJob) -> None:
+    logger.info(f"Starting #{job.id} | {job.email} | {job.proxy}")
+
+    job.grass = Grass(job.id, job.email, job.password, job.proxy, job.db)
+
+    await claim_budget.acquire()
+    job.claimed = await job.grass.claim_rewards(claim_budget)
+
+
+async def claim_accounts(accounts: List[tuple]) -> int:
+    success = 0
+    # tiers claimed -> accounts
+    claimed = Counter()
+
+    async def on_done(job: ClaimJob, is_success: bool):
+        nonlocal success
+        success += int(is_success)
+        if is_success:
+            claimed[job.claimed] += 1
+
+        if job.grass:
+            await job.grass.session.close()
+        AutoReger.logs(job.id, job.account, is_success)
+
+    pipeline = Pipeline(Stage("claim", claim_rewards, settings.CLAIM_THREADS), on_done=on_done)
+    await pipeline.run(ClaimJob(account) for account in accounts)
+
+    logger.info(f"Claimed {sum(tiers * count for tiers, count in claimed.items())} rewards on "
+                f"{success - claimed[0]} accounts | nothing to claim: {claimed[0]} | failed: {len(accounts) - success}"
+                + "".join(f" | {tiers} tiers: {count}" for tiers, count in sorted(claimed.items()) if tiers))
+
+    return success
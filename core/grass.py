@@ -1,7 +1,8 @@
 import asyncio
 import random
+import time
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import aiohttp
 from fake_useragent import UserAgent
@@ -15,25 +16,39 @@ from .utils import logger
 
 from .utils.accounts_db import AccountsDB
 from .utils.error_helper import raise_error, FailureCounter
+from .utils.socks_connector import create_connector, is_socks_proxy
+from .utils.points import PointsCollector
+from .utils.rate_limiter import TokenBucket
+from .utils.reconnect import ConnectionState, ReconnectStats, decorrelated_jitter, reconnect_budget
+from .utils.traffic import TrafficMeter, TrafficBudget, create_trace_config
 from .utils.exception import WebsocketClosedException, LowProxyScoreException, ProxyScoreNotFoundException, \
     ProxyForbiddenException, ProxyError, WebsocketConnectionFailedError, FailureLimitReachedException, \
-    NoProxiesException, ProxyBlockedException, SiteIsDownException, LoginException
+    NoProxiesException, ProxyBlockedException, SiteIsDownException, LoginException, TrafficLimitExceededException
 from better_proxy import Proxy
 
 
 class Grass(GrassWs, GrassRest, FailureCounter):
     # global_fail_counter = 0
+    traffic_budget: Optional[TrafficBudget] = None
+    # points are checked by collector, not by mining loop
+    points_collector: Optional[PointsCollector] = None
 
     def __init__(self, _id: int, email: str, password: str, proxy: str = None, db: AccountsDB = None):
         self.proxy = Proxy.from_str(proxy).as_url if proxy else None
         super(GrassWs, self).__init__(email=email, password=password, user_agent=UserAgent().random, proxy=self.proxy)
+        GrassWs.__init__(self, user_agent=self.user_agent, proxy=self.proxy)
         self.proxy_score: Optional[int] = None
         self.id: int = _id
 
+        # kept across websocket drops and proxy changes, so only websocket leg is rebuilt
+        self.user_id: Optional[str] = None
+        self.browser_ids: Dict[str, str] = {}
+        self.state: ConnectionState = ConnectionState.IDLE
+
         self.db: AccountsDB = db
 
-        self.session: aiohttp.ClientSession = aiohttp.ClientSession(trust_env=True,
-                                                                    connector=aiohttp.TCPConnector(ssl=False))
+        self.rest_traffic: TrafficMeter = TrafficMeter(self.proxy, "rest", email)
+        self.session: aiohttp.ClientSession = self.create_session()
 
         self.proxies: List[str] = []
         self.is_extra_proxies_left: bool = True
@@ -49,15 +64,21 @@ class Grass(GrassWs, GrassRest, FailureCounter):
         while True:
             try:
                 Grass.is_site_down()
+                self.check_traffic_budget()
 
-                user_id = await self.enter_account()
-
-                browser_id = str(uuid.uuid3(uuid.NAMESPACE_DNS, self.proxy or ""))
+                if self.user_id is None:
+                    self.user_id = await self.enter_account()
+                    if Grass.points_collector:
+                        Grass.points_collector.add(self)
 
-                await self.run(browser_id, user_id)
+                await self.run(self.get_browser_id_for_proxy(), self.user_id)
             except LoginException as e:
                 logger.warning(f"LoginException | {self.id} | {e}")
                 return False
+            except TrafficLimitExceededException as e:
+                await self.delay_with_log(f"{self.id} | {e}. Paused until budget reset",
+                                          int(Grass.traffic_budget.seconds_until_reset()) + 1)
+                continue
             except (ProxyBlockedException, ProxyForbiddenException) as e:
                 self.proxies.remove(self.proxy)
                 msg = "Proxy forbidden"
@@ -88,14 +109,23 @@ class Grass(GrassWs, GrassRest, FailureCounter):
             await asyncio.sleep(random.uniform(20, 21))
 
     async def run(self, browser_id: str, user_id: str):
+        delay = 0
+        dropped_at = None
+
         while True:
             try:
+                self.state = ConnectionState.CONNECTING
                 await self.connection_handler()
+                self.start_reader()
 
+                self.state = ConnectionState.AUTHENTICATING
                 await self.auth_to_extension(browser_id, user_id)
 
-                if settings.NODE_TYPE != "2x":
-                    await self.handle_http_request_action()
+                self.state = ConnectionState.MINING
+                if dropped_at is not None:
+                    ReconnectStats.add(time.monotonic() - dropped_at)
+                    dropped_at = None
+                delay = 0
 
                 for i in range(10 ** 9):
                     if settings.MIN_PROXY_SCORE and self.proxy_score is None:
@@ -104,8 +134,9 @@ class Grass(GrassWs, GrassRest, FailureCounter):
                         else:
                             raise ProxyScoreNotFoundException("Proxy score not found")
 
+                    self.check_reader()
+                    self.check_traffic_budget()
                     await self.send_ping()
-                    await self.send_pong()
 
                     msg = f"{self.id} | {self.email} | Mined grass."
                     if settings.SHOW_LOGS_RARELY:
@@ -117,17 +148,14 @@ class Grass(GrassWs, GrassRest, FailureCounter):
                     if settings.MIN_PROXY_SCORE and self.proxy_score is None:
                         await self.handle_proxy_score(settings.MIN_PROXY_SCORE, browser_id)
 
-                    if settings.CHECK_POINTS and i % 100 == 0:
-                        points = await self.get_points_handler()
-                        await self.db.update_or_create_point_stat(self.id, self.email, points)
-                        logger.info(f"{self.id} | {self.email} | Total points: {points}")
                     # if not (i % 1000):
                     #     total_points = await self.db.get_total_points()
                     #     logger.info(f"Total points in database: {total_points or 0}")
                     if i:
                         self.fail_reset()
 
-                    await asyncio.sleep(random.randint(119, 120))
+                    # PONG and HTTP_REQUEST frames are answered by reader meanwhile
+                    await self.wait_closed(random.randint(119, 120))
             except (WebsocketClosedException, ConnectionResetError, TypeError) as e:
                 logger.info(f"{self.id} | {type(e).__name__}: {e}. Reconnecting...")
             # except ConnectionResetError as e:
@@ -137,15 +165,24 @@ class Grass(GrassWs, GrassRest, FailureCounter):
                 # await self.delay_with_log(msg=f"{self.id} | Reconnecting with delay for some minutes...", sleep_time=60)
             # except Exception as e:
             #     logger.info(f"{self.id} | {traceback.format_exc()}")
+            finally:
+                await self.stop_reader()
+
+            if dropped_at is None:
+                dropped_at = time.monotonic()
+
             await self.failure_handler(limit=3)
 
-            await asyncio.sleep(5, 10)
+            self.state = ConnectionState.BACKOFF
+            delay = decorrelated_jitter(delay)
+            await asyncio.sleep(delay)
 
-    async def claim_rewards(self):
+    async def claim_rewards(self, rate_limiter: TokenBucket = None) -> int:
         await self.enter_account()
-        await self.claim_rewards_handler()
+        claimed = await self.claim_rewards_handler(rate_limiter)
 
-        logger.info(f"{self.id} | Claimed all rewards.")
+        logger.info(f"{self.id} | Claimed {claimed} rewards." if claimed else f"{self.id} | Nothing to claim.")
+        return claimed
 
     @retry(stop=stop_after_attempt(7),
            retry=(retry_if_exception_type(ConnectionError) | retry_if_not_exception_type(ProxyForbiddenException)),
@@ -154,6 +191,8 @@ class Grass(GrassWs, GrassRest, FailureCounter):
            wait=wait_random(7, 10),
            reraise=True)
     async def connection_handler(self):
+        # accounts with best proxy score get connection slots first
+        await reconnect_budget.acquire(priority=-(self.proxy_score or 0))
         logger.info(f"{self.id} | Connecting...")
         await self.connect()
         logger.info(f"{self.id} | Connected")
@@ -164,7 +203,7 @@ class Grass(GrassWs, GrassRest, FailureCounter):
     #        wait=wait_random(1, 3))
     async def handle_proxy_score(self, min_score: int, browser_id: str):
         for _ in range(3):
-            await asyncio.sleep(25, 30)
+            await asyncio.sleep(random.uniform(25, 30))
             if (proxy_score := await self.get_proxy_score_by_device_handler(browser_id)) is None:
                 # logger.info(f"{self.id} | Proxy score not found for {self.proxy}. Guess Bad proxies! Continue...")
                 # return None
@@ -179,8 +218,35 @@ class Grass(GrassWs, GrassRest, FailureCounter):
         logger.info(f"{self.id} | Proxy score not found for {self.proxy}. Waiting for score...")
 
 
+    def create_session(self) -> aiohttp.ClientSession:
+        # SOCKS proxy is built into connector, so session is bound to it
+        return aiohttp.ClientSession(
+            trust_env=True, connector=create_connector(self.proxy, ssl=False),
+            trace_configs=[create_trace_config(lambda: self.rest_traffic)]
+        )
+
+    def check_traffic_budget(self):
+        if Grass.traffic_budget and Grass.traffic_budget.enabled:
+            Grass.traffic_budget.check(self.proxy, self.email)
+
+    def get_browser_id_for_proxy(self) -> str:
+        if (browser_id := self.browser_ids.get(self.proxy)) is None:
+            browser_id = self.browser_ids[self.proxy] = str(uuid.uuid3(uuid.NAMESPACE_DNS, self.proxy or ""))
+
+        return browser_id
+
     async def change_proxy(self):
-        self.proxy = await self.get_new_proxy()
+        proxy = await self.get_new_proxy()
+        if proxy != self.proxy:
+            self.proxy_score = None
+
+            if is_socks_proxy(proxy) or is_socks_proxy(self.proxy):
+                await self.session.close()
+                self.proxy = proxy
+                self.session = self.create_session()
+
+        self.proxy = proxy
+        self.rest_traffic = TrafficMeter(self.proxy, "rest", self.email)
 
     async def get_new_proxy(self):
         while self.is_extra_proxies_left:
@@ -0,0 +1,55 @@
+import json
+from typing import Any
+
+try:
+    import orjson  # optional, pip install orjson
+except ImportError:
+    orjson = None
+
+from data.config import settings
+
+
+class JsonCodec:
+    name = "json"
+
+    @staticmethod
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    @staticmethod
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    @staticmethod
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+codecs = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+}
+
+
+def get_codec(name: str = "auto") -> JsonCodec:
+    if name == "auto":
+        return OrjsonCodec() if orjson else JsonCodec()
+
+    if name == OrjsonCodec.name and orjson is None:
+        raise ImportError("WS_JSON_CODEC is 'orjson', but orjson is not installed: pip install orjson")
+
+    if name not in codecs:
+        raise ValueError(f"Unknown WS_JSON_CODEC '{name}'. Use one of: auto, {', '.join(codecs)}")
+
+    return codecs[name]()
+
+
+codec = get_codec(settings.WS_JSON_CODEC)
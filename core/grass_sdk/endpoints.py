@@ -0,0 +1,73 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+from data.config import settings
+
+
+class EndpointStats:
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+
+        self.samples = 0
+        self.connect_time = 0.0  # ewma of successful connects, seconds
+        self.failure_rate = 0.0  # ewma of failures, 0..1
+
+    def add(self, connect_time: Optional[float]):
+        failed = connect_time is None
+
+        if self.samples == 0:
+            self.failure_rate = float(failed)
+            self.connect_time = connect_time or 0.0
+        else:
+            self.failure_rate += self.alpha * (float(failed) - self.failure_rate)
+            if not failed:
+                self.connect_time += self.alpha * (connect_time - self.connect_time)
+
+        self.samples += 1
+
+    @property
+    def score(self) -> float:
+        # expected seconds per successful connect, lower is better
+        return (self.connect_time or 1.0) / max(0.05, 1 - self.failure_rate)
+
+
+class EndpointSelector:
+    def __init__(self, endpoints: List[str], explore: float = 0.1, alpha: float = 0.2):
+        if not endpoints:
+            raise ValueError("WS_ENDPOINTS is empty")
+
+        self.endpoints = endpoints
+        self.explore = explore
+        self.alpha = alpha
+
+        # (proxy, endpoint) -> stats, proxy None keeps stats of whole fleet
+        self.stats: Dict[Tuple[Optional[str], str], EndpointStats] = {}
+
+    def get_stats(self, proxy: Optional[str], endpoint: str) -> EndpointStats:
+        if (stats := self.stats.get((proxy, endpoint))) is None:
+            stats = self.stats[(proxy, endpoint)] = EndpointStats(self.alpha)
+        return stats
+
+    def score(self, proxy: Optional[str], endpoint: str) -> float:
+        for key in ((proxy, endpoint), (None, endpoint)):
+            if (stats := self.stats.get(key)) and stats.samples:
+                return stats.score
+        return 0.0  # never tried, worth a try
+
+    def choose(self, proxy: str = None) -> str:
+        if len(self.endpoints) == 1 or random.random() < self.explore:
+            return random.choice(self.endpoints)
+
+        scores = {endpoint: self.score(proxy, endpoint) for endpoint in self.endpoints}
+        best_score = min(scores.values())
+
+        return random.choice([endpoint for endpoint, score in scores.items() if score == best_score])
+
+    def report(self, proxy: Optional[str], endpoint: str, connect_time: Optional[float]):
+        # connect_time None means failed connect
+        self.get_stats(proxy, endpoint).add(connect_time)
+        if proxy is not None:
+            self.get_stats(None, endpoint).add(connect_time)
+
+
+endpoint_selector = EndpointSelector(settings.WS_ENDPOINTS, settings.WS_ENDPOINT_EXPLORE)
@@ -1,16 +1,19 @@
-import json
+import asyncio
 import time
-from base64 import b64decode, b64encode
-from random import choice
+from typing import Callable, Dict, List, Set
 
 from aiohttp import WSMsgType
-import uuid
 
 from better_proxy import Proxy
 
+from core.utils import logger
 from core.utils.exception import WebsocketClosedException, ProxyForbiddenException
-
-import os, base64
+from .codec import codec
+from .endpoints import endpoint_selector
+from .http_request import HttpRequestEngine
+from .messages import MessageTemplates, get_templates
+from core.utils.socks_connector import request_proxy
+from core.utils.traffic import TrafficMeter, payload_size
 
 from data.config import settings
 
@@ -25,154 +28,211 @@ class GrassWs:
         self.id = None
         # self.ws_session = None
 
+        self.reader_task = None
+        self.ws_handlers: Dict[str, Callable] = {
+            "PONG": self.handle_pong_action,
+            "HTTP_REQUEST": self.spawn_http_request_action,
+        }
+        self.ws_waiters: Dict[str, List[asyncio.Future]] = {}
+        self.ws_jobs: Set[asyncio.Task] = set()
+        self.http_engine: HttpRequestEngine = None
+        self.ws_traffic: TrafficMeter = TrafficMeter(proxy, "ws")
+        self.templates: MessageTemplates = get_templates(settings.NODE_TYPE)
+
     async def connect(self):
         # self.proxy=None # testing on local network
-        connection_port = ["4444", "4650"]
-        uri = f"wss://proxy2.wynd.network:{choice(connection_port)}/"
-
-        random_bytes = os.urandom(16)
-        sec_websocket_key = base64.b64encode(random_bytes).decode('utf-8')
+        uri = endpoint_selector.choose(self.proxy)
 
         headers = {
             'Pragma': 'no-cache',
             'Origin': 'chrome-extension://lkbnfiajjmbhnfledhphioinpickokdi',
             'Accept-Language': 'en-US,en;q=0.9',
-            'Sec-WebSocket-Key': sec_websocket_key,
             'User-Agent': self.user_agent,
-            'Upgrade': 'websocket',
             'Cache-Control': 'no-cache',
-            'Connection': 'Upgrade',
-            'Sec-WebSocket-Version': '13',
-            'Sec-WebSocket-Extensions': 'permessage-deflate; client_max_window_bits',
         }
 
+        email = getattr(self, "email", None)
+        self.ws_traffic = TrafficMeter(self.proxy, "ws", email)
+        self.http_engine = HttpRequestEngine(self.proxy, traffic=TrafficMeter(self.proxy, "http_request", email))
+
+        started_at = time.monotonic()
         try:
-            self.websocket = await self.session.ws_connect(uri, proxy_headers=headers, proxy=self.proxy)
+            # compress=15 makes aiohttp negotiate permessage-deflate and set Sec-WebSocket-* headers itself
+            self.websocket = await self.session.ws_connect(uri, headers=headers, proxy=request_proxy(self.proxy),
+                                                           compress=15)
+            endpoint_selector.report(self.proxy, uri, time.monotonic() - started_at)
         except Exception as e:
+            endpoint_selector.report(self.proxy, uri, None)
             if 'status' in dir(e) and e.status == 403:
                 raise ProxyForbiddenException(f"Low proxy score. Can't connect. Error: {e}")
             raise e
 
-    async def send_message(self, message):
+        if not self.websocket.compress:
+            logger.debug(f"{self.id} | permessage-deflate was not negotiated")
+
+    async def send_message(self, message: dict | str):
         # logger.info(f"Sending: {message}")
+        if not isinstance(message, str):
+            message = codec.dumps(message)
+
+        self.ws_traffic.add_out(payload_size(message))
         await self.websocket.send_str(message)
 
     async def receive_message(self):
         msg = await self.websocket.receive()
         # logger.info(f"Received: {msg}")
 
-        if msg.type == WSMsgType.CLOSED:
+        if msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSING, WSMsgType.CLOSED, WSMsgType.ERROR):
             raise WebsocketClosedException(f"Websocket closed: {msg}")
 
-        return json.loads(msg.data)
+        self.ws_traffic.add_in(payload_size(msg.data))
+        return codec.loads(msg.data)
+    def register_handler(self, action: str, handler: Callable):
+        self.ws_handlers[action] = handler
+
+    def start_reader(self):
+        self.ws_waiters = {}
+        self.reader_task = asyncio.create_task(self.read_messages())
+
+    async def stop_reader(self):
+        if self.reader_task and not self.reader_task.done():
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        for job in self.ws_jobs:
+            job.cancel()
+        self.ws_jobs = set()
+
+        self.release_waiters()
+
+        if self.websocket and not self.websocket.closed:
+            await self.websocket.close()
+
+    def release_waiters(self, error: Exception = None):
+        for waiters in self.ws_waiters.values():
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if error:
+                    waiter.set_exception(error)
+                else:
+                    waiter.cancel()
+
+        self.ws_waiters = {}
+
+    async def read_messages(self):
+        try:
+            while True:
+                try:
+                    message = await self.receive_message()
+                except ValueError as e:
+                    logger.debug(f"{self.id} | Skipped not json frame: {e}")
+                    continue
+
+                await self.dispatch_message(message)
+        except Exception as e:
+            self.release_waiters(e)
+            raise
+
+    async def dispatch_message(self, message):
+        if not isinstance(message, dict):
+            logger.debug(f"{self.id} | Skipped unexpected frame: {message}")
+            return
+
+        action = message.get("action") or message.get("origin_action")
+
+        waiters = self.ws_waiters.pop(action, [])
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(message)
+
+        if handler := self.ws_handlers.get(action):
+            try:
+                await handler(message)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.debug(f"{self.id} | Bad {action} frame: {type(e).__name__}: {e}")
+        elif not waiters:
+            logger.debug(f"{self.id} | Skipped unexpected {action} frame: {message}")
+
+    async def wait_for_action(self, action: str, timeout: float = 60):
+        waiter = asyncio.get_running_loop().create_future()
+        self.ws_waiters.setdefault(action, []).append(waiter)
+
+        try:
+            await asyncio.wait({waiter, self.reader_task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            return waiter.result()
+
+        self.check_reader()
+        raise WebsocketClosedException(f"{action} frame not received for {timeout} seconds")
+
+    async def wait_closed(self, timeout: float):
+        await asyncio.wait({self.reader_task}, timeout=timeout)
+        self.check_reader()
+
+    def check_reader(self):
+        if self.reader_task is None or not self.reader_task.done():
+            return
+
+        if not self.reader_task.cancelled() and (e := self.reader_task.exception()):
+            if isinstance(e, WebsocketClosedException):
+                raise e
+            raise WebsocketClosedException(f"Websocket reader stopped: {type(e).__name__}: {e}")
+        raise WebsocketClosedException("Websocket reader stopped")
 
     async def get_connection_id(self):
-        msg = await self.receive_message()
+        msg = await self.wait_for_action("AUTH")
         return msg['id']
 
     async def auth_to_extension(self, browser_id: str, user_id: str):
         connection_id = await self.get_connection_id()
 
-        message = {
-            "id": connection_id,
-            "origin_action": "AUTH",
-            "result": {
-                "browser_id": browser_id,
-                "user_id": user_id,
-                "user_agent": self.user_agent,
-                "timestamp": int(time.time()),
-                "device_type": "extension",
-                "version": "4.26.2",
-                "extension_id": "ilehaonighjijnmpnagapkhpcdbhclfg"
-            }
-        }
-
-        if settings.NODE_TYPE == "1_25x":
-            message['result'].update({
-                "extension_id": "lkbnfiajjmbhnfledhphioinpickokdi",
-            })
-        elif settings.NODE_TYPE == "2x":
-            message['result'].update({
-                "device_type": "desktop",
-                "version": "4.30.0",
-            })
-            message['result'].pop("extension_id")
+        message = self.templates.auth_message(connection_id, browser_id, user_id, self.user_agent)
 
-        await self.send_message(json.dumps(message))
+        await self.send_message(message)
 
     async def send_ping(self):
-        message = json.dumps(
-            {"id": str(uuid.uuid4()), "version": "1.0.0", "action": "PING", "data": {}}
-        )
+        await self.send_message(self.templates.ping_message())
 
-        await self.send_message(message)
+    async def send_pong(self, connection_id: str):
+        await self.send_message(self.templates.pong_message(connection_id))
 
-    async def send_pong(self):
-        connection_id = await self.get_connection_id()
+    async def handle_pong_action(self, message: dict):
+        await self.send_pong(message['id'])
 
-        message = json.dumps(
-            {"id": connection_id, "origin_action": "PONG"}
-        )
+    async def spawn_http_request_action(self, http_info: dict):
+        # served in background, reader must not wait for the upstream response
+        job = asyncio.create_task(self.handle_http_request_action(http_info))
+        self.ws_jobs.add(job)
+        job.add_done_callback(self.on_job_done)
 
-        await self.send_message(message)
+    def on_job_done(self, job: asyncio.Task):
+        self.ws_jobs.discard(job)
 
-    async def handle_http_request_action(self):
-        http_info = await self.receive_message()
+        if not job.cancelled() and (e := job.exception()):
+            logger.debug(f"{self.id} | HTTP_REQUEST job failed: {type(e).__name__}: {e}")
+
+    async def handle_http_request_action(self, http_info: dict):
         result = await self.build_http_request(http_info['data'])
 
         if result == {}:
-            raise ConnectionResetError("Not full http request action.")
+            logger.debug(f"{self.id} | Not full http request action. Skipped")
+            return
 
-        message = json.dumps(
-            {
-                "id": http_info["id"],
-                "origin_action": "HTTP_REQUEST",
-                "result": result
-            }
-        )
+        message = {
+            "id": http_info["id"],
+            "origin_action": "HTTP_REQUEST",
+            "result": result
+        }
 
         await self.send_message(message)
 
     async def build_http_request(self, request_data):
-        if request_data.get("method") is None:
-            return {}
-
-        method = request_data['method']
-        url = request_data['url']
-        headers = request_data['headers']
-        body = request_data.get("body")  # there may be no body
-
-        if body:
-            body = b64decode(
-                body)  # this will probably be in json format when decoded but i dont think there is a need to turn it to a json
-
-        try:
-            # if self.proxy:
-            #     proxy_to_encode = Proxy.from_str(self.proxy)
-            #     encoded_proxy = base64.b64encode(bytes(f'{proxy_to_encode.login}:{proxy_to_encode.password}', 'utf-8'))
-            #     encoded_proxy_as_str = encoded_proxy.decode('utf-8')
-            #     headers['proxy-authorization'] = encoded_proxy_as_str
-
-            response = await self.session.request(method, url,
-                                                  headers=headers, data=body, proxy=self.proxy)
-
-            if response:
-                response.raise_for_status()
-                response_headers_raw = response.headers
-                response_headers = dict(response_headers_raw)
-                response_body = await response.content.read()
-                status_reason = response.reason
-                status_code = response.status
-                encoded_body = b64encode(response_body)
-                encoded_body_as_str = encoded_body.decode('utf-8')
-                return {
-                    "body": encoded_body_as_str,
-                    "headers": response_headers,
-                    "status": status_code,
-                    "status_text": status_reason,
-                    "url": url
-                }
-
-        except Exception as e:
-            # return this if anything happened
-            return {}  # return an empty string if we have issues running the request
+        return await self.http_engine.handle(request_data)
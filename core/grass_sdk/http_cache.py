@@ -0,0 +1,126 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from core.utils import logger
+
+max_age_regex = re.compile(r'(?:s-maxage|max-age)\s*=\s*"?(\d+)')
+
+
+class HttpResponseCache:
+    def __init__(self, max_size: int, max_ttl: int, log_every: int = 1000):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.log_every = log_every
+
+        self.entries: OrderedDict[Tuple, Tuple[float, int, dict]] = OrderedDict()
+        self.size = 0
+        self.inflight: Dict[Tuple, asyncio.Task] = {}
+
+        self.hits = 0
+        self.merged = 0
+        self.misses = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.merged + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.merged) / self.lookups if self.lookups else 0.0
+
+    def stats(self) -> str:
+        return (f"HTTP cache: hit rate {self.hit_rate:.1%} | hits {self.hits} | merged {self.merged} | "
+                f"misses {self.misses} | {len(self.entries)} entries, {self.size / 1024 / 1024:.1f} MB")
+
+    @staticmethod
+    def make_key(request_data: dict) -> Tuple:
+        headers = request_data.get('headers') or {}
+        normalized_headers = tuple(sorted((str(k).strip().lower(), str(v).strip()) for k, v in headers.items()))
+
+        return request_data['method'].upper(), request_data['url'], normalized_headers
+
+    def is_cacheable_request(self, request_data: dict) -> bool:
+        return self.max_size > 0 and str(request_data.get('method')).upper() == "GET" and not request_data.get('body')
+
+    def get_ttl(self, result: dict) -> int:
+        if not result or result.get('status') != 200:
+            return 0
+
+        headers = {k.lower(): v for k, v in result.get('headers', {}).items()}
+        cache_control = headers.get('cache-control', '').lower()
+
+        if any(directive in cache_control for directive in ('no-store', 'no-cache', 'private')) \
+                or 'set-cookie' in headers or headers.get('vary') == '*':
+            return 0
+
+        if not (max_age := max_age_regex.search(cache_control)):
+            return 0
+
+        age = int(headers['age']) if headers.get('age', '').isdigit() else 0
+
+        return max(0, min(int(max_age.group(1)) - age, self.max_ttl))
+
+    def get(self, key: Tuple) -> Optional[dict]:
+        if (entry := self.entries.get(key)) is None:
+            return None
+
+        expires_at, size, result = entry
+        if expires_at < time.monotonic():
+            self.pop(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return result
+
+    def put(self, key: Tuple, result: dict, ttl: int):
+        size = len(result.get('body', '')) + 64 * len(result.get('headers', {}))
+        if size > self.max_size:
+            return
+
+        self.pop(key)
+        self.entries[key] = (time.monotonic() + ttl, size, result)
+        self.size += size
+
+        while self.size > self.max_size:
+            self.pop(next(iter(self.entries)))
+
+    def pop(self, key: Tuple):
+        if (entry := self.entries.pop(key, None)) is not None:
+            self.size -= entry[1]
+
+    async def fetch(self, request_data: dict, fetcher: Callable[[dict], Awaitable[dict]]) -> dict:
+        if not self.is_cacheable_request(request_data):
+            return await fetcher(request_data)
+
+        key = self.make_key(request_data)
+
+        if (result := self.get(key)) is not None:
+            self.hits += 1
+        elif (task := self.inflight.get(key)) is not None:
+            self.merged += 1
+            result = await asyncio.shield(task)
+        else:
+            self.misses += 1
+            # fetch lives in own task, so cancelled caller doesn't break merged ones
+            task = asyncio.create_task(self.fetch_and_store(key, request_data, fetcher))
+            self.inflight[key] = task
+            result = await asyncio.shield(task)
+
+        if self.log_every and self.lookups % self.log_every == 0:
+            logger.info(self.stats())
+
+        return result
+
+    async def fetch_and_store(self, key: Tuple, request_data: dict, fetcher: Callable[[dict], Awaitable[dict]]):
+        try:
+            result = await fetcher(request_data)
+
+            if ttl := self.get_ttl(result):
+                self.put(key, result, ttl)
+
+            return result
+        finally:
+            self.inflight.pop(key, None)
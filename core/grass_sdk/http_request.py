@@ -0,0 +1,123 @@
+import asyncio
+from base64 import b64decode, b64encode
+from typing import Dict, Optional
+
+import aiohttp
+
+from core.utils import logger
+from core.utils.exception import HttpRequestBodyTooLargeException
+from core.utils.socks_connector import create_connector, request_proxy
+from core.utils.traffic import TrafficMeter, headers_size
+from data.config import settings
+from .http_cache import HttpResponseCache
+
+
+class HttpRequestEngine:
+    # one keep-alive pool per proxy, shared by every connection that goes through it
+    sessions: Dict[Optional[str], aiohttp.ClientSession] = {}
+    # same GET is often requested from several nodes within seconds
+    cache = HttpResponseCache(settings.HTTP_CACHE_SIZE_MB * 1024 * 1024, settings.HTTP_CACHE_MAX_TTL)
+
+    chunk_size = 3 * 16 * 1024  # multiple of 3, so chunks are base64 encoded without padding
+
+    def __init__(self, proxy: str = None, threads: int = None, max_body_size: int = None, timeout: int = None,
+                 traffic: TrafficMeter = None):
+        self.proxy = proxy
+        self.traffic = traffic or TrafficMeter(proxy, "http_request")
+        self.threads = threads or settings.HTTP_REQUEST_THREADS
+        self.max_body_size = max_body_size or settings.HTTP_REQUEST_MAX_BODY_SIZE
+        self.timeout = aiohttp.ClientTimeout(total=timeout or settings.HTTP_REQUEST_TIMEOUT)
+
+        self.semaphore = asyncio.Semaphore(self.threads)
+        self.pending = 0
+        self.max_pending = self.threads * 4
+
+    @classmethod
+    def get_session(cls, proxy: str = None) -> aiohttp.ClientSession:
+        session = cls.sessions.get(proxy)
+
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=create_connector(proxy, ssl=False, limit_per_host=settings.HTTP_REQUEST_THREADS,
+                                           keepalive_timeout=60)
+            )
+            cls.sessions[proxy] = session
+
+        return session
+
+    @classmethod
+    async def close_sessions(cls):
+        sessions, cls.sessions = cls.sessions, {}
+
+        for session in sessions.values():
+            await session.close()
+
+    async def handle(self, request_data: dict) -> dict:
+        if request_data.get("method") is None:
+            return {}
+
+        if self.pending >= self.max_pending:
+            logger.debug(f"Too many HTTP_REQUEST jobs for {self.proxy}. Skipped {request_data.get('url')}")
+            return {}
+
+        self.pending += 1
+        try:
+            return await self.cache.fetch(request_data, self.fetch_limited)
+        finally:
+            self.pending -= 1
+
+    async def fetch_limited(self, request_data: dict) -> dict:
+        async with self.semaphore:
+            return await self.fetch(request_data)
+
+    async def fetch(self, request_data: dict) -> dict:
+        method = request_data['method']
+        url = request_data['url']
+        headers = request_data['headers']
+        body = request_data.get("body")  # there may be no body
+
+        if body:
+            body = b64decode(body)
+
+        self.traffic.add_out(len(method) + len(url) + headers_size(headers) + len(body or b""))
+
+        try:
+            async with self.get_session(self.proxy).request(method, url, headers=headers, data=body,
+                                                            proxy=request_proxy(self.proxy),
+                                                            timeout=self.timeout) as response:
+                self.traffic.add_in(headers_size(response.headers))
+                response.raise_for_status()
+
+                if response.content_length and response.content_length > self.max_body_size:
+                    raise HttpRequestBodyTooLargeException(f"Content-Length {response.content_length}")
+
+                return {
+                    "body": await self.read_body(response),
+                    "headers": {str(k): v for k, v in response.headers.items()},
+                    "status": response.status,
+                    "status_text": response.reason,
+                    "url": url
+                }
+        except Exception as e:
+            logger.debug(f"HTTP_REQUEST {method} {url} failed: {type(e).__name__}: {e}")
+            return {}
+
+    async def read_body(self, response: aiohttp.ClientResponse) -> str:
+        encoded_parts = []
+        tail = b""
+        size = 0
+
+        async for chunk in response.content.iter_chunked(self.chunk_size):
+            size += len(chunk)
+            self.traffic.add_in(len(chunk))
+            if size > self.max_body_size:
+                raise HttpRequestBodyTooLargeException(f"Body is bigger than {self.max_body_size} bytes")
+
+            chunk = tail + chunk
+            cut = len(chunk) - len(chunk) % 3
+            encoded_parts.append(b64encode(chunk[:cut]).decode('ascii'))
+            tail = chunk[cut:]
+
+        encoded_parts.append(b64encode(tail).decode('ascii'))
+
+        return "".join(encoded_parts)
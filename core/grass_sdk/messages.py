@@ -0,0 +1,102 @@
+import itertools
+import time
+import uuid
+from typing import Dict
+
+from .codec import codec
+
+
+class MessageIdGenerator:
+    # uuid4 shaped ids: random per process prefix + counter, much cheaper than uuid4() per message
+    def __init__(self):
+        self.prefix = str(uuid.uuid4())[:24]
+        self.counter = itertools.count()
+
+    def __call__(self) -> str:
+        return f"{self.prefix}{next(self.counter) & 0xFFFFFFFFFFFF:012x}"
+
+
+class MessageTemplates:
+    markers = ("@@ID@@", "@@BROWSER_ID@@", "@@USER_ID@@", "@@USER_AGENT@@", "@@TIMESTAMP@@")
+
+    def __init__(self, node_type: str):
+        self.node_type = node_type
+        self.new_id = MessageIdGenerator()
+
+        self.auth_template = self.compile(self.auth_message_dict(node_type, *self.markers))
+        self.auth_cache: Dict[tuple, str] = {}
+
+        ping_head, ping_tail = codec.dumps(
+            {"id": self.markers[0], "version": "1.0.0", "action": "PING", "data": {}}
+        ).split(f'"{self.markers[0]}"')
+        self.ping_head = ping_head + '"'
+        self.ping_tail = '"' + ping_tail
+
+    @staticmethod
+    def auth_message_dict(node_type: str, connection_id, browser_id, user_id, user_agent, timestamp) -> dict:
+        message = {
+            "id": connection_id,
+            "origin_action": "AUTH",
+            "result": {
+                "browser_id": browser_id,
+                "user_id": user_id,
+                "user_agent": user_agent,
+                "timestamp": timestamp,
+                "device_type": "extension",
+                "version": "4.26.2",
+                "extension_id": "ilehaonighjijnmpnagapkhpcdbhclfg"
+            }
+        }
+
+        if node_type == "1_25x":
+            message['result'].update({
+                "extension_id": "lkbnfiajjmbhnfledhphioinpickokdi",
+            })
+        elif node_type == "2x":
+            message['result'].update({
+                "device_type": "desktop",
+                "version": "4.30.0",
+            })
+            message['result'].pop("extension_id")
+
+        return message
+
+    def compile(self, message: dict) -> str:
+        # two stages: account fields are spliced once per account, id and timestamp on every message
+        template = codec.dumps(message).replace("%", "%%%%")
+
+        for marker in self.markers:
+            placeholder = "%%s" if marker in (self.markers[0], self.markers[-1]) else "%s"
+            template = template.replace(f'"{marker}"', placeholder)
+
+        return template
+
+    def auth_account_template(self, browser_id: str, user_id: str, user_agent: str) -> str:
+        key = (browser_id, user_id, user_agent)
+
+        if (template := self.auth_cache.get(key)) is None:
+            template = self.auth_template % tuple(codec.dumps(value).replace("%", "%%") for value in key)
+            self.auth_cache[key] = template
+
+        return template
+
+    def auth_message(self, connection_id: str, browser_id: str, user_id: str, user_agent: str) -> str:
+        return self.auth_account_template(browser_id, user_id, user_agent) % (codec.dumps(connection_id),
+                                                                               int(time.time()))
+
+    def ping_message(self) -> str:
+        return self.ping_head + self.new_id() + self.ping_tail
+
+    @staticmethod
+    def pong_message(connection_id: str) -> str:
+        return '{"id":' + codec.dumps(connection_id) + ',"origin_action":"PONG"}'
+
+
+templates: Dict[str, MessageTemplates] = {}
+
+
+def get_templates(node_type: str) -> MessageTemplates:
+    if node_type not in templates:
+        templates[node_type] = MessageTemplates(node_type)
+
+    return templates[node_type]
@@ -1,27 +1,32 @@
 import ast
 import asyncio
-import base64
 import json
 import random
+import re
 import time
+from typing import Union
 
-import base58
 from aiohttp import ContentTypeError, ClientConnectionError
 from pydantic.networks import pretty_email_regex
 from tenacity import retry, stop_after_attempt, wait_random, retry_if_not_exception_type
 
 from core.utils import logger
-from core.utils.captcha_service import CaptchaService
+from core.utils.captcha_pool import captcha_pool
 from core.utils.exception import LoginException, ProxyBlockedException, EmailApproveLinkNotFoundException, \
     RegistrationException, CloudFlareHtmlException, ProxyScoreNotFoundException
-from core.utils.generate.person import Person
+from core.utils.generate.identity import identity_factory
 from core.utils.mail.mail import MailUtils
+from core.utils.rate_limiter import TokenBucket
 from core.utils.session import BaseClient
-from solders.keypair import Keypair
+from core.utils.wallet import Wallet
 
 from data.config import settings
 
 
+# link in verification mail: .../token=<token>/...
+EMAIL_TOKEN_RE = re.compile(r"token=([^/\s\"'<>&]+)")
+
+
 class GrassRest(BaseClient):
     def __init__(self, email: str, password: str, user_agent: str = None, proxy: str = None):
         super().__init__(user_agent, proxy)
@@ -29,6 +34,9 @@ class GrassRest(BaseClient):
         self.password = password
 
         self.id = None
+        self.username = None
+
+        self.reward_tiers = 8  # referral program tiers
 
     async def create_account_handler(self):
         handler = retry(
@@ -41,15 +49,19 @@ class GrassRest(BaseClient):
 
         return await handler(self.create_account)()
 
-    async def create_account(self):
+    async def create_account(self, json_data: dict = None):
+        # json_data may be prepared beforehand by get_json_params, e.g. with captcha solved by pipeline
         url = 'https://api.getgrass.io/register'
 
         params = {
             'app': 'dashboard',
         }
 
-        response = await self.session.post(url, headers=self.website_headers, json=await self.get_json_params(params),
-                                           proxy=self.proxy)
+        if json_data is None:
+            json_data = await self.get_json_params(params)
+
+        response = await self.session.post(url, headers=self.website_headers, json=json_data,
+                                           proxy=self.request_proxy)
         if response.status != 200 or "error" in await response.text():
             if "Email Already Registered" in await response.text() or \
                 "Your registration could not be completed at this time." in await response.text():
@@ -62,12 +74,14 @@ class GrassRest(BaseClient):
             raise RegistrationException(f"Create acc response: | {error_msg}")
 
         logger.info(f"{self.email} | Account created!")
+        self.save_account()
 
+        return await response.json()
+
+    def save_account(self):
         with open("logs/new_accounts.txt", "a", encoding="utf-8") as f:
             f.write(f"{self.email}:{self.password}:{self.username}\n")
 
-        return await response.json()
-
     async def enter_account(self):
         res_json = await self.handle_login()
         self.website_headers['Authorization'] = res_json['result']['data']['accessToken']
@@ -80,11 +94,12 @@ class GrassRest(BaseClient):
     async def retrieve_user(self):
         url = 'https://api.getgrass.io/retrieveUser'
 
-        response = await self.session.get(url, headers=self.website_headers, proxy=self.proxy)
+        response = await self.session.get(url, headers=self.website_headers, proxy=self.request_proxy)
 
         return await response.json()
 
-    async def claim_rewards_handler(self):
+    async def claim_rewards_handler(self, rate_limiter: TokenBucket = None) -> int:
+        # tiers are claimed one by one till site says nothing is left, returns count of claimed ones
         handler = retry(
             stop=stop_after_attempt(3),
             before_sleep=lambda retry_state, **kwargs: logger.info(f"{self.id} | Retrying to claim rewards... "
@@ -93,19 +108,33 @@ class GrassRest(BaseClient):
             reraise=True
         )
 
-        for _ in range(8):
-            await handler(self.claim_reward_for_tier)()
-            await asyncio.sleep(random.uniform(1, 3))
+        claimed = 0
+        for _ in range(self.reward_tiers):
+            if rate_limiter:
+                await rate_limiter.acquire()
+            if not await handler(self.claim_reward_for_tier)():
+                break
+
+            claimed += 1
+            if not rate_limiter:
+                await asyncio.sleep(random.uniform(1, 3))
 
-        return True
+        return claimed
 
-    async def claim_reward_for_tier(self):
+    async def claim_reward_for_tier(self) -> bool:
+        # True - tier claimed, False - no claimable tier left, raises on unexpected answer to be retried
         url = 'https://api.getgrass.io/claimReward'
 
-        response = await self.session.post(url, headers=self.website_headers, proxy=self.proxy)
+        response = await self.session.post(url, headers=self.website_headers, proxy=self.request_proxy)
+        res_json = await response.json()
+
+        if res_json.get("result") == {}:
+            return True
+        if 400 <= response.status < 500 and response.status != 429 and res_json.get("error"):
+            logger.debug(f"{self.id} | Nothing to claim: {res_json['error'].get('message')}")
+            return False
 
-        assert (await response.json()).get("result") == {}
-        return True
+        raise Exception(f"Unexpected claim response: {response.status} {res_json}")
 
     async def get_points_handler(self):
         handler = retry(
@@ -121,7 +150,7 @@ class GrassRest(BaseClient):
     async def get_points(self):
         url = 'https://api.getgrass.io/users/earnings/epochs'
 
-        response = await self.session.get(url, headers=self.website_headers, proxy=self.proxy)
+        response = await self.session.get(url, headers=self.website_headers, proxy=self.request_proxy)
 
         logger.debug(f"{self.id} | Get Points response: {await response.text()}")
 
@@ -158,7 +187,7 @@ class GrassRest(BaseClient):
         }
 
         response = await self.session.post(url, headers=self.website_headers, data=json.dumps(json_data),
-                                           proxy=self.proxy)
+                                           proxy=self.request_proxy)
         # logger.debug(f"{self.id} | Login response: {await response.text()}")
 
         try:
@@ -213,7 +242,7 @@ class GrassRest(BaseClient):
             }
 
             response = await self.session.post(
-                url, headers=self.website_headers, proxy=self.proxy, data=json.dumps(json_data)
+                url, headers=self.website_headers, proxy=self.request_proxy, data=json.dumps(json_data)
             )
             response_data = await response.json()
 
@@ -238,7 +267,7 @@ class GrassRest(BaseClient):
 
             url = f'https://api.getgrass.io/{endpoint}'
             response = await self.session.post(
-                url, headers=headers, proxy=self.proxy
+                url, headers=headers, proxy=self.request_proxy
             )
             response_data = await response.json()
 
@@ -247,20 +276,18 @@ class GrassRest(BaseClient):
 
         return await approve_email_retry()
 
-    def sign_message(self, private_key: str, timestamp: int):
-        keypair = Keypair.from_bytes(base58.b58decode(private_key))
-
+    def sign_message(self, wallet: Wallet, timestamp: int):
         msg = f"""By signing this message you are binding this wallet to all activities associated to your Grass account and agree to our Terms and Conditions (https://www.getgrass.io/terms-and-conditions) and Privacy Policy (https://www.getgrass.io/privacy-policy).
 
 Nonce: {timestamp}"""
 
-        address = keypair.pubkey().__str__()
-        pub_key = base64.b64encode(keypair.pubkey().__bytes__()).decode('utf-8')
-        signature_str = base64.b64encode(keypair.sign_message(msg.encode("utf-8")).__bytes__()).decode('utf-8')
+        return wallet.address, wallet.public_key, wallet.sign(msg)
 
-        return address, pub_key, signature_str
+    async def link_wallet(self, wallet: Union[str, Wallet]):
+        # wallet comes prepared by prepare_wallets, private key string is decoded here once
+        if isinstance(wallet, str):
+            wallet = Wallet(wallet)
 
-    async def link_wallet(self, private_key: str):
         @retry(
             stop=stop_after_attempt(3),
             wait=wait_random(5, 7),
@@ -272,7 +299,7 @@ Nonce: {timestamp}"""
             url = 'https://api.getgrass.io/verifySignedMessage'
 
             timestamp = int(time.time())
-            signatures = self.sign_message(private_key, timestamp)
+            signatures = self.sign_message(wallet, timestamp)
 
             json_data = {
                 'signedMessage': signatures[2],
@@ -282,7 +309,7 @@ Nonce: {timestamp}"""
                 'isLedger': False,
             }
 
-            response = await self.session.post(url, headers=self.website_headers, proxy=self.proxy, json=json_data)
+            response = await self.session.post(url, headers=self.website_headers, proxy=self.request_proxy, json=json_data)
             response_data = await response.json()
 
             if response_data.get("result") == {}:
@@ -309,9 +336,8 @@ Nonce: {timestamp}"""
                 result = await mail_utils.get_msg_async(to=self.email, #from_="no-reply@grassfoundation.io",
                                                         subject=email_subject, delay=60)
 
-            if result['success']:
-                verify_token = result['msg'].split('token=')[1].split('/')[0]
-                return verify_token
+            if result['success'] and (match := EMAIL_TOKEN_RE.search(result['msg'])):
+                return match.group(1)
             else:
                 raise EmailApproveLinkNotFoundException(
                     f"{self.id} | {self.email} Email approve link not found for minute! Exited!")
@@ -325,7 +351,7 @@ Nonce: {timestamp}"""
     async def get_user_info(self):
         url = 'https://api.getgrass.io/users/dash'
 
-        response = await self.session.get(url, headers=self.website_headers, proxy=self.proxy)
+        response = await self.session.get(url, headers=self.website_headers, proxy=self.request_proxy)
         return await response.json()
 
     # async def get_device_info(self, device_id: str, user_id: str):
@@ -336,18 +362,18 @@ Nonce: {timestamp}"""
     #         'user_id': user_id,
     #     }
     #
-    #     response = await self.session.get(url, headers=self.website_headers, params=params, proxy=self.proxy)
+    #     response = await self.session.get(url, headers=self.website_headers, params=params, proxy=self.request_proxy)
     #     return await response.json()
 
     async def get_devices_info(self):
         url = 'https://api.getgrass.io/activeIps'  # /extension/user-score /activeDevices
 
-        response = await self.session.get(url, headers=self.website_headers, proxy=self.proxy)
+        response = await self.session.get(url, headers=self.website_headers, proxy=self.request_proxy)
         return await response.json()
 
     async def get_device_info(self, device_id: str):
         url = f"https://api.getgrass.io/retrieveDevice?input=%7B%22deviceId%22:%22{device_id}%22%7D"
-        response = await self.session.get(url, headers=self.website_headers, proxy=self.proxy)
+        response = await self.session.get(url, headers=self.website_headers, proxy=self.request_proxy)
         return await response.json()
 
     async def get_proxy_score_by_device_handler(self, browser_id: str):
@@ -408,8 +434,12 @@ Nonce: {timestamp}"""
     #     device_info = await self.get_device_info(device_id, user_id)
     #     return device_info['data']['final_score']
 
-    async def get_json_params(self, ref_code: str = ""):
-        self.username = Person().username
+    def make_identity(self):
+        self.username = identity_factory.username()
+
+    async def get_json_params(self, ref_code: str = "", captcha_token: str = None):
+        if self.username is None:
+            self.make_identity()
 
         json_data = {
             'email': self.email,
@@ -423,8 +453,9 @@ Nonce: {timestamp}"""
             ],
         }
 
-        captcha_service = CaptchaService()
-        json_data['recaptchaToken'] = await captcha_service.get_captcha_token_async()
+        if captcha_token is None:
+            captcha_token = await captcha_pool.get()
+        json_data['recaptchaToken'] = captcha_token
 
         json_data.pop('referral', None)
         json_data['referralCode'] = ref_code
@@ -435,4 +466,4 @@ Nonce: {timestamp}"""
         self.ip = await self.get_ip()
 
     async def get_ip(self):
-        return await (await self.session.get('https://api.ipify.org', proxy=self.proxy)).text()
+        return await (await self.session.get('https://api.ipify.org', proxy=self.request_proxy)).text()
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable, List
+
+from core.utils import logger
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[Any], Awaitable[Any]], workers: int = 1, queue_size: int = 0):
+        # func returns item for next stage, or None when item needs no more stages
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+
+        self.done = 0
+        self.failed = 0
+        self.busy_time = 0.0
+
+    def __str__(self):
+        return f"{self.name}: {self.done} done / {self.failed} failed ({self.workers} workers, {self.busy_time:.0f}s busy)"
+
+
+class Pipeline:
+    """
+    Items go through stages one after another, each stage has its own workers and queue in front of it,
+    so slow stage (mail, captcha) doesn't hold workers of fast one and both are kept busy
+    """
+    def __init__(self, *stages: Stage, on_done: Callable[[Any, bool], Any] = None):
+        # on_done(item, success) is called once item leaves pipeline
+        self.stages = stages
+        self.on_done = on_done
+
+        self.queues: List[asyncio.Queue] = []
+
+    async def run(self, items: Iterable[Any]):
+        self.queues = [asyncio.Queue(stage.queue_size) for stage in self.stages]
+        started_at = time.monotonic()
+
+        workers = [
+            asyncio.create_task(self.worker(index))
+            for index, stage in enumerate(self.stages) for _ in range(stage.workers)
+        ]
+
+        try:
+            for item in items:
+                await self.queues[0].put(item)
+
+            # every item went through stage before its queue drained, so stages finish in order
+            for queue in self.queues:
+                await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        logger.info(f"Pipeline finished in {time.monotonic() - started_at:.0f}s | "
+                    + " | ".join(str(stage) for stage in self.stages))
+
+    async def worker(self, index: int):
+        stage, queue = self.stages[index], self.queues[index]
+        is_last = index == len(self.stages) - 1
+
+        while True:
+            item = await queue.get()
+            started_at = time.monotonic()
+
+            try:
+                result = await stage.func(item)
+            except Exception as e:
+                stage.failed += 1
+                logger.warning(f"{item} | {stage.name} failed: {e}")
+                await self.finish(item, False)
+            else:
+                stage.done += 1
+                if result is None or is_last:
+                    await self.finish(item if result is None else result, True)
+                else:
+                    await self.queues[index + 1].put(result)
+            finally:
+                stage.busy_time += time.monotonic() - started_at
+                queue.task_done()
+
+    async def finish(self, item: Any, success: bool):
+        if self.on_done is None:
+            return
+
+        try:
+            if asyncio.iscoroutine(result := self.on_done(item, success)):
+                await result
+        except Exception as e:
+            logger.error(f"{item} | on_done error: {e}")
@@ -0,0 +1,78 @@
+import asyncio
+import random
+from typing import List, Optional
+
+from core.autoreger import AutoReger
+from core.grass import Grass
+from core.pipeline import Pipeline, Stage
+from core.utils import logger
+from core.utils.captcha_pool import captcha_pool
+from core.utils.generate.identity import identity_factory
+from data.config import settings
+
+
+class RegisterJob:
+    def __init__(self, account: tuple, username: str, password: str):
+        # account as given by AutoReger: (id, "email 🚀 password", proxy, wallet, db),
+        # username and password for accounts without one are made for all accounts at once
+        self.account = account
+        self.id, line, self.proxy, self.wallet, self.db = account
+
+        consumables = line.split(" 🚀 ")[:2]
+        self.email = consumables[0]
+        self.password = consumables[1] if len(consumables) > 1 else password
+        self.username = username
+
+        self.grass: Optional[Grass] = None
+        self.captcha_token: Optional[str] = None
+
+    def __str__(self):
+        return f"{self.id} | {self.email}"
+
+
+async def make_identity(job: RegisterJob) -> RegisterJob:
+    job.grass = Grass(job.id, job.email, job.password, job.proxy, job.db)
+    job.grass.username = job.username
+    return job
+
+
+async def solve_captcha(job: RegisterJob) -> RegisterJob:
+    # pool solves ahead of demand, usually token is already there
+    job.captcha_token = await captcha_pool.get()
+    return job
+
+
+async def submit_registration(job: RegisterJob) -> RegisterJob:
+    await asyncio.sleep(random.uniform(*settings.REGISTER_DELAY))
+    logger.info(f"Starting #{job.id} | {job.email} | {job.proxy}")
+
+    json_data = await job.grass.get_json_params({'app': 'dashboard'}, captcha_token=job.captcha_token)
+    await job.grass.create_account(json_data)
+    return job
+
+
+async def register_accounts(accounts: List[tuple]) -> int:
+    success = 0
+
+    async def on_done(job: RegisterJob, is_success: bool):
+        nonlocal success
+        success += int(is_success)
+
+        if job.grass:
+            await job.grass.session.close()
+        AutoReger.logs(job.id, job.account, is_success)
+
+    # short queues in front of captcha and submit: no crowd of open sessions waiting,
+    # and solved tokens don't get old before they are sent
+    pipeline = Pipeline(
+        Stage("identity", make_identity),
+        Stage("captcha", solve_captcha, settings.REGISTER_CAPTCHA_THREADS, settings.REGISTER_CAPTCHA_THREADS),
+        Stage("submit", submit_registration, settings.THREADS, settings.THREADS),
+        on_done=on_done,
+    )
+    usernames = identity_factory.usernames(len(accounts))
+    passwords = identity_factory.passwords(len(accounts))
+
+    await pipeline.run(RegisterJob(*job_data) for job_data in zip(accounts, usernames, passwords))
+
+    return success
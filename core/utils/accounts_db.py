@@ -38,8 +38,25 @@ class AccountsDB:
         points TEXT NOT NULL
         )
         ''')
+
+        await self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS TrafficUsage (
+        scope TEXT NOT NULL,
+        key TEXT NOT NULL,
+        period TEXT NOT NULL,
+        bytes INTEGER NOT NULL,
+        PRIMARY KEY (scope, key, period)
+        )
+        ''')
         await self.connection.commit()
 
+    async def clear_tables(self):
+        # everything except traffic usage, budgets must survive restarts
+        async with self.db_lock:
+            for table in ("Accounts", "ProxyList", "PointStats"):
+                await self.cursor.execute(f"DELETE FROM {table}")
+            await self.connection.commit()
+
     async def add_account(self, email, new_proxy):
         async with self.db_lock:
             await self.cursor.execute("SELECT proxies FROM Accounts WHERE email=?", (email,))
@@ -85,6 +102,16 @@ class AccountsDB:
 
             await self.connection.commit()
 
+    async def update_point_stats(self, stats):
+        # [(user_id, email, points)] in one transaction
+        async with self.db_lock:
+            await self.cursor.executemany(
+                "INSERT INTO PointStats(id, email, points) VALUES(?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET email = excluded.email, points = excluded.points",
+                stats
+            )
+            await self.connection.commit()
+
     async def get_total_points(self):
         async with self.db_lock:
             await self.cursor.execute(
@@ -130,5 +157,20 @@ class AccountsDB:
             await self.cursor.execute("DELETE FROM ProxyList")
             await self.connection.commit()
 
+    async def add_traffic_usage(self, period, usage):
+        async with self.db_lock:
+            await self.cursor.executemany(
+                "INSERT INTO TrafficUsage(scope, key, period, bytes) VALUES(?, ?, ?, ?) "
+                "ON CONFLICT(scope, key, period) DO UPDATE SET bytes = bytes + excluded.bytes",
+                [(scope, key, period, size) for (scope, key), size in usage.items()]
+            )
+            await self.connection.commit()
+
+    async def get_traffic_usage(self, period):
+        async with self.db_lock:
+            await self.cursor.execute("SELECT scope, key, bytes FROM TrafficUsage WHERE period=?", (period,))
+            rows = await self.cursor.fetchall()
+        return {(scope, key): size for scope, key, size in rows}
+
     async def close_connection(self):
         await self.connection.close()
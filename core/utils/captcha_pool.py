@@ -0,0 +1,144 @@
+import asyncio
+import math
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Set, Tuple
+
+from core.utils import logger
+from core.utils import captcha_service
+from data.config import settings
+
+
+class CaptchaTokenPool:
+    """
+    Solved captcha tokens kept ready, so registration doesn't wait whole solve time.
+    Pool size follows demand: tokens taken per second * solve time, so there are
+    enough solves in flight to cover consumption, but tokens don't get old waiting
+    """
+    def __init__(self, solve: Callable[[], Awaitable[str]] = None, max_age: float = 100,
+                 min_size: int = 1, max_size: int = 50, window: float = 60):
+        self.solve = solve  # default CaptchaService is made on first use, after config is final
+        self.max_age = max_age  # reCAPTCHA token lives ~120s, keep margin for submit
+        self.min_size = min_size
+        self.max_size = max_size
+        self.window = window  # seconds of history used for consumption rate
+
+        self.tokens: Deque[Tuple[str, float]] = deque()  # (token, solved at), oldest first
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.solving: Set[asyncio.Task] = set()
+
+        self.taken: Deque[float] = deque()  # times tokens were taken
+        self.solve_times: Deque[float] = deque(maxlen=20)
+
+        self.expired = 0
+        self.maintainer: Optional[asyncio.Task] = None
+
+    @property
+    def loop_time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def consumption_rate(self) -> float:
+        now = self.loop_time
+        while self.taken and self.taken[0] < now - self.window:
+            self.taken.popleft()
+
+        if not self.taken:
+            return 0.0
+        # short history at start would give huge rate, count at least 10s
+        return len(self.taken) / max(now - self.taken[0], 10.0)
+
+    def target_size(self) -> int:
+        # tokens ready + being solved, 0 when nobody takes them
+        if not (rate := self.consumption_rate()):
+            return 0
+
+        solve_time = sum(self.solve_times) / len(self.solve_times) if self.solve_times else 30.0
+        # rate * solve time tokens are in flight, half as much more kept ready for bursts
+        return min(max(math.ceil(rate * solve_time * 1.5), self.min_size), self.max_size)
+
+    def drop_expired(self):
+        expired_before = self.loop_time - self.max_age
+        while self.tokens and self.tokens[0][1] <= expired_before:
+            self.tokens.popleft()
+            self.expired += 1
+
+    async def get(self) -> str:
+        self.taken.append(self.loop_time)
+        self.drop_expired()
+
+        if self.solve is None:
+            # looked up through module, interface reloads it after saving captcha keys
+            self.solve = captcha_service.CaptchaService().get_captcha_token_async
+        if self.maintainer is None or self.maintainer.done():
+            self.maintainer = asyncio.create_task(self.maintain())
+
+        if self.tokens:
+            token, _ = self.tokens.popleft()
+            self.refill()
+            return token
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.refill()
+
+        try:
+            return await waiter
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def refill(self):
+        waiting = sum(not waiter.done() for waiter in self.waiters)
+        needed = max(self.target_size(), waiting) - len(self.tokens) - len(self.solving)
+
+        for _ in range(min(needed, self.max_size - len(self.solving))):
+            task = asyncio.create_task(self.solve_one())
+            self.solving.add(task)
+            task.add_done_callback(self.solving.discard)
+
+    async def solve_one(self):
+        started_at = self.loop_time
+
+        try:
+            token = await self.solve()
+        except Exception as e:
+            logger.warning(f"Captcha solve failed: {e}")
+            await asyncio.sleep(3)
+            return
+
+        if not token:
+            return
+
+        self.solve_times.append(self.loop_time - started_at)
+
+        while self.waiters:
+            if not (waiter := self.waiters.popleft()).done():
+                waiter.set_result(token)
+                return
+
+        self.tokens.append((token, self.loop_time))
+
+    async def maintain(self):
+        # keeps pool sized while tokens are taken, stops once demand is gone
+        while self.tokens or self.waiters or self.consumption_rate():
+            self.drop_expired()
+            self.refill()
+            await asyncio.sleep(1)
+
+    async def close(self):
+        tasks = list(self.solving) + ([self.maintainer] if self.maintainer else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for waiter in self.waiters:
+            waiter.cancel()
+
+        self.waiters.clear()
+        self.tokens.clear()
+
+        if self.expired:
+            logger.info(f"Captcha pool: {self.expired} tokens expired unused")
+
+
+captcha_pool = CaptchaTokenPool(max_age=settings.CAPTCHA_TOKEN_MAX_AGE,
+                                min_size=settings.CAPTCHA_POOL_SIZE[0], max_size=settings.CAPTCHA_POOL_SIZE[1])
@@ -1,16 +1,223 @@
 import asyncio
-import captchatools
-import importlib
-import data.config
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from core.utils import logger
+from core.utils.exception import CaptchaSolveException
 from data.config import settings
 
+
+class CaptchaClient:
+    """
+    Task is created once, then result is polled with sleeps between requests,
+    so waiting solve takes no thread and hundreds of solves share one session
+    """
+    name = ""
+    first_poll_delay = 10  # reCAPTCHA is never solved faster
+    poll_interval = 3
+
+    def __init__(self, api_key: str, params: dict, session_getter):
+        self.api_key = api_key
+        self.params = params  # settings.CAPTCHA_PARAMS
+        self.get_session = session_getter
+
+    async def request(self, method: str, url: str, **kwargs) -> dict:
+        # provider answers are small json, connection errors are retried few times
+        for attempt in range(3):
+            try:
+                async with self.get_session().request(method, url, **kwargs) as response:
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                if attempt == 2:
+                    raise CaptchaSolveException(f"{self.name} request failed: {e}")
+                await asyncio.sleep(1)
+
+    async def create_task(self) -> Tuple[Optional[str], Optional[str]]:
+        # (task id, token if it was solved right away)
+        raise NotImplementedError
+
+    async def get_result(self, task_id: str) -> Optional[str]:
+        # token, None while task is processing
+        raise NotImplementedError
+
+    async def solve(self, timeout: float = 180) -> str:
+        task_id, token = await self.create_task()
+        if token:
+            return token
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        await asyncio.sleep(self.first_poll_delay)
+        while loop.time() < deadline:
+            if token := await self.get_result(task_id):
+                return token
+            await asyncio.sleep(self.poll_interval)
+
+        raise CaptchaSolveException(f"{self.name} didn't solve task {task_id} in {timeout}s")
+
+
+class TaskApiClient(CaptchaClient):
+    # createTask / getTaskResult json api
+    base_url = ""
+    task_types = {"v2": "RecaptchaV2TaskProxyless", "v3": "RecaptchaV3TaskProxyless"}
+
+    def task(self) -> dict:
+        captcha_type = self.params.get("captcha_type", "v2").lower()
+        task = {
+            "type": self.task_types[captcha_type],
+            "websiteURL": self.params["captcha_url"],
+            "websiteKey": self.params["sitekey"],
+        }
+
+        if captcha_type == "v3":
+            task["minScore"] = self.params.get("min_score", 0.7)
+            task["pageAction"] = self.params.get("action", "verify")
+        elif self.params.get("invisible_captcha"):
+            task["isInvisible"] = True
+
+        return task
+
+    def check(self, response: dict) -> dict:
+        if response.get("errorId"):
+            raise CaptchaSolveException(f"{self.name}: {response.get('errorCode')} {response.get('errorDescription', '')}")
+        return response
+
+    async def create_task(self) -> Tuple[Optional[str], Optional[str]]:
+        response = self.check(await self.request(
+            "POST", f"{self.base_url}/createTask", json={"clientKey": self.api_key, "task": self.task()}
+        ))
+
+        if response.get("status") == "ready":  # capsolver may answer at once
+            return None, response["solution"]["gRecaptchaResponse"]
+        return response["taskId"], None
+
+    async def get_result(self, task_id: str) -> Optional[str]:
+        response = self.check(await self.request(
+            "POST", f"{self.base_url}/getTaskResult", json={"clientKey": self.api_key, "taskId": task_id}
+        ))
+
+        if response.get("status") == "ready":
+            return response["solution"]["gRecaptchaResponse"]
+        return None
+
+
+class TwoCaptchaClient(TaskApiClient):
+    name = "2captcha"
+    base_url = "https://api.2captcha.com"
+
+
+class AntiCaptchaClient(TaskApiClient):
+    name = "anticaptcha"
+    base_url = "https://api.anti-captcha.com"
+
+
+class CapMonsterClient(TaskApiClient):
+    name = "capmonster"
+    base_url = "https://api.capmonster.cloud"
+    task_types = {"v2": "NoCaptchaTaskProxyless", "v3": "RecaptchaV3TaskProxyless"}
+
+
+class CapSolverClient(TaskApiClient):
+    name = "capsolver"
+    base_url = "https://api.capsolver.com"
+    task_types = {"v2": "ReCaptchaV2TaskProxyLess", "v3": "ReCaptchaV3TaskProxyLess"}
+
+
+class CaptchaAIClient(CaptchaClient):
+    # 2captcha-like in.php / res.php api
+    name = "captchaai"
+    base_url = "https://ocr.captchaai.com"
+    poll_interval = 5
+
+    async def create_task(self) -> Tuple[Optional[str], Optional[str]]:
+        params = {
+            "key": self.api_key,
+            "json": 1,
+            "method": "userrecaptcha",
+            "googlekey": self.params["sitekey"],
+            "pageurl": self.params["captcha_url"],
+        }
+
+        if self.params.get("captcha_type", "v2").lower() == "v3":
+            params.update(version="v3", action=self.params.get("action", "verify"),
+                          min_score=self.params.get("min_score", 0.7))
+        elif self.params.get("invisible_captcha"):
+            params["invisible"] = 1
+
+        response = await self.request("GET", f"{self.base_url}/in.php", params=params)
+        if response.get("status") != 1:
+            raise CaptchaSolveException(f"{self.name}: {response.get('request')}")
+        return response["request"], None
+
+    async def get_result(self, task_id: str) -> Optional[str]:
+        response = await self.request("GET", f"{self.base_url}/res.php", params={
+            "key": self.api_key, "action": "get", "id": task_id, "json": 1
+        })
+
+        if response.get("status") == 1:
+            return response["request"]
+        if response.get("request") == "CAPCHA_NOT_READY":
+            return None
+        raise CaptchaSolveException(f"{self.name}: {response.get('request')}")
+
+
+class ProviderStats:
+    def __init__(self, size: int = 50):
+        self.latencies: Deque[float] = deque(maxlen=size)  # of successful solves
+        self.started = 0
+        self.solved = 0
+        self.failed = 0
+
+    @property
+    def success_rate(self) -> float:
+        finished = self.solved + self.failed
+        return self.solved / finished if finished else 1.0
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def expected_time(self) -> float:
+        # time per token incl. failed tries, service without numbers yet is tried first
+        if (median := self.percentile(50)) is None:
+            return 0.0
+        return median / max(self.success_rate, 0.1)
+
+    def __str__(self):
+        median = self.percentile(50)
+        return (f"{self.solved}/{self.started} solved, {self.failed} failed"
+                + (f", p50 {median:.1f}s" if median is not None else ""))
+
+
 class CaptchaService:
+    clients = {client.name: client for client in (
+        TwoCaptchaClient, AntiCaptchaClient, CapMonsterClient, CapSolverClient, CaptchaAIClient
+    )}
+    # all solves poll through one keep-alive pool
+    session: Optional[aiohttp.ClientSession] = None
+
+    # shared by all instances: routing and hedging learn from every solve
+    stats: Dict[str, ProviderStats] = {}
+    solves = 0
+    hedges = 0
+    default_hedge_delay = 60  # till first service has enough solves to know its percentile
+
     def __init__(self):
-        pass
+        # settings are read once, interface reloads this module after saving new keys
+        self.service_api_map = self.get_service_api_map()
+        self.params = dict(settings.CAPTCHA_PARAMS)
 
-    def get_service_api_map(self):
-        importlib.reload(data.config)
-        
+        self.hedging = settings.CAPTCHA_HEDGING
+        self.hedge_percentile = settings.CAPTCHA_HEDGE_PERCENTILE
+        self.max_extra = settings.CAPTCHA_HEDGE_MAX_EXTRA
+
+    @staticmethod
+    def get_service_api_map() -> Dict[str, str]:
         return {
             "2captcha": settings.TWO_CAPTCHA_API_KEY,
             "anticaptcha": settings.ANTICAPTCHA_API_KEY,
@@ -19,22 +226,97 @@ class CaptchaService:
             "captchaai": settings.CAPTCHAAI_API_KEY,
         }
 
-    def get_captcha_token(self):
-        captcha_config = self.parse_captcha_type()
-        if captcha_config:
-            solver = captchatools.new_harvester(**captcha_config, **data.config.CAPTCHA_PARAMS)
-            return solver.get_token()
-        return None
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        if cls.session is None or cls.session.closed:
+            cls.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        return cls.session
+
+    @classmethod
+    async def close_session(cls):
+        if cls.session is not None:
+            await cls.session.close()
+            cls.session = None
+
+        if cls.stats:
+            logger.info(f"Captcha: {cls.solves} solves, {cls.hedges} hedged | "
+                        + " | ".join(f"{name}: {stats}" for name, stats in cls.stats.items()))
 
     def parse_captcha_type(self, exit_on_fail: bool = True):
-        service_api_map = self.get_service_api_map()
-        for service, api_key in service_api_map.items():
+        for service, api_key in self.service_api_map.items():
             if api_key:
                 return {"solving_site": service, "api_key": api_key}
         if exit_on_fail:
             exit("No valid captcha solving service API key found")
         # raise ValueError("No valid captcha solving service API key found")
         return None
-        
+
+    def get_clients(self) -> List[CaptchaClient]:
+        # all services with key, fastest first
+        if not self.parse_captcha_type():
+            return []
+
+        clients = [self.clients[service](api_key, self.params, self.get_session)
+                   for service, api_key in self.service_api_map.items() if api_key]
+        return sorted(clients, key=lambda client: self.stats.setdefault(client.name, ProviderStats()).expected_time())
+
+    async def solve_with(self, client: CaptchaClient) -> str:
+        stats = self.stats.setdefault(client.name, ProviderStats())
+        stats.started += 1
+
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+
+        try:
+            token = await client.solve()
+        except Exception:
+            stats.failed += 1
+            raise
+
+        stats.solved += 1
+        stats.latencies.append(loop.time() - started_at)
+        return token
+
+    def can_hedge(self) -> bool:
+        return CaptchaService.hedges < CaptchaService.solves * self.max_extra
+
+    async def solve_hedged(self, primary: CaptchaClient, backup: CaptchaClient) -> str:
+        # backup is asked when primary failed, or is slower than its usual percentile and extra spend allows,
+        # first token wins and other task is dropped
+        hedge_delay = self.stats[primary.name].percentile(self.hedge_percentile) or self.default_hedge_delay
+
+        running = {asyncio.create_task(self.solve_with(primary))}
+        backup_started = False
+        error = None
+
+        try:
+            while running:
+                done, running = await asyncio.wait(running, timeout=None if backup_started else hedge_delay,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                if not backup_started and (done or self.can_hedge()):
+                    if not done:
+                        CaptchaService.hedges += 1
+                    backup_started = True
+                    running.add(asyncio.create_task(self.solve_with(backup)))
+
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
     async def get_captcha_token_async(self):
-        return await asyncio.to_thread(self.get_captcha_token)
\ No newline at end of file
+        if not (clients := self.get_clients()):
+            return None
+
+        CaptchaService.solves += 1
+        if self.hedging and len(clients) > 1:
+            return await self.solve_hedged(*clients[:2])
+        return await self.solve_with(clients[0])
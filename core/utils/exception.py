@@ -58,3 +58,12 @@ class RegistrationException(Exception):
 
 class CloudFlareHtmlException(Exception):
     pass
+
+class HttpRequestBodyTooLargeException(Exception):
+    pass
+
+class TrafficLimitExceededException(Exception):
+    pass
+
+class CaptchaSolveException(Exception):
+    pass
@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import string
+from array import array
+from typing import List, NamedTuple, Optional, Tuple
+
+import names
+import random_words
+
+NICKNAMES_FILE = os.path.join(os.path.dirname(random_words.__file__), "nicknames.dat")
+NAMES_DIR = os.path.dirname(names.__file__)
+EMAIL_DOMAINS = ('gmail.com', 'outlook.com', 'yahoo.com')
+
+
+class Identity(NamedTuple):
+    username: str
+    first_name: str
+    last_name: str
+    email: str
+    password: str
+
+
+class NameCorpus:
+    # names of census list with cumulative frequency, picked like names.get_name does
+    def __init__(self, file_name: str):
+        self.names: List[str] = []
+        self.cum_weights = array("d")
+
+        with open(os.path.join(NAMES_DIR, file_name)) as file:
+            for line in file:
+                name, _, cumulative, _ = line.split()
+                self.names.append(name.capitalize())
+                self.cum_weights.append(float(cumulative))
+
+    def sample(self, count: int) -> List[str]:
+        return random.choices(self.names, cum_weights=self.cum_weights, k=count)
+
+
+class IdentityFactory:
+    """
+    Nicknames and names lists are read from disk once per process,
+    then usernames, names, emails and passwords are made in bulk from memory
+    """
+    def __init__(self):
+        self.nicknames: Optional[Tuple[str, ...]] = None  # female + male, lowercase
+        self.first_names: Optional[Tuple[NameCorpus, NameCorpus]] = None  # male, female
+        self.last_names: Optional[NameCorpus] = None
+
+    def load(self):
+        if self.nicknames is not None:
+            return
+
+        with open(NICKNAMES_FILE) as file:
+            nicknames = json.load(file)
+        # RandomNicknames picked gender first, both lists are about same size
+        self.nicknames = tuple(nick.lower() for gender in ("f", "m")
+                               for nicks in nicknames[gender].values() for nick in nicks)
+
+        self.first_names = (NameCorpus("dist.male.first"), NameCorpus("dist.female.first"))
+        self.last_names = NameCorpus("dist.all.last")
+
+    def usernames(self, count: int) -> List[str]:
+        self.load()
+        letters = string.ascii_lowercase
+
+        return [
+            nick + "".join(random.choices(letters, k=random.randint(1, 5))) + str(random.randint(1, 999))
+            for nick in random.choices(self.nicknames, k=count)
+        ]
+
+    def username(self) -> str:
+        return self.usernames(1)[0]
+
+    def full_names(self, count: int) -> List[Tuple[str, str]]:
+        self.load()
+
+        males = sum(random.getrandbits(1) for _ in range(count))
+        first_names = self.first_names[0].sample(males) + self.first_names[1].sample(count - males)
+        random.shuffle(first_names)
+
+        return list(zip(first_names, self.last_names.sample(count)))
+
+    @staticmethod
+    def emails(usernames: List[str]) -> List[str]:
+        return [f"{username[:-random.randint(1, 2)]}@{random.choice(EMAIL_DOMAINS)}" for username in usernames]
+
+    @staticmethod
+    def passwords(count: int, length: int = 8) -> List[str]:
+        letters, digits, upper = string.ascii_lowercase, string.digits, string.ascii_uppercase
+
+        return [
+            "".join(random.choices(letters, k=length)) + random.choice(digits) + random.choice(upper)
+            + random.choice('.@!$')
+            for _ in range(count)
+        ]
+
+    def identities(self, count: int) -> List[Identity]:
+        usernames = self.usernames(count)
+
+        return [
+            Identity(username, first_name, last_name, email, password)
+            for username, (first_name, last_name), email, password in zip(
+                usernames, self.full_names(count), self.emails(usernames), self.passwords(count)
+            )
+        ]
+
+
+identity_factory = IdentityFactory()
@@ -1,15 +1,14 @@
 import random
 import string
 
-import names
-from random_words import RandomNicknames  # pip install RandomWords
+from .identity import identity_factory
 
 
 class Person:
     def __init__(self):
-        self.username = RandomNicknames().random_nick(gender=random.choice(['f', 'm'])).lower() + \
-                        Person.random_string_old(random.randint(1, 5)) + str(random.randint(1, 999))
-        self.first_name, self.last_name = names.get_full_name().split(" ")
+        # word lists are loaded once by factory, use it directly to make many at once
+        self.username = identity_factory.username()
+        self.first_name, self.last_name = identity_factory.full_names(1)[0]
 
     @staticmethod
     def random_string_old(length, chars=string.ascii_lowercase):
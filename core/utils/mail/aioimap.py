@@ -0,0 +1,244 @@
+"""
+Minimal asyncio IMAP4rev1 client, so many mailboxes can be checked on one thread without blocking it
+"""
+import asyncio
+import itertools
+import re
+import ssl
+from typing import List, Optional, Tuple, Union
+
+# one server response in imaplib-like form: plain lines and (line, literal) pairs
+Response = List[Union[bytes, Tuple[bytes, bytes]]]
+
+LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+TOKEN_RE = re.compile(
+    rb'(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    rb'|(?P<atom>[^\s()"\[\]]+(?:\[[^\]]*\](?:<[^>]*>)?)?)'
+)
+
+
+class IMAP4Error(Exception):
+    pass
+
+
+def quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def response_head(response: Response) -> bytes:
+    return response[0][0] if isinstance(response[0], tuple) else response[0]
+
+
+def parse_response(response: Response) -> list:
+    # s-expression -> nested lists: atoms and quoted strings as str, literals as bytes, NIL as None
+    stack = [[]]
+
+    for part in response:
+        line, literal = part if isinstance(part, tuple) else (part, None)
+        if literal is not None:
+            line = line[:line.rindex(b"{")]
+
+        for match in TOKEN_RE.finditer(line):
+            kind = match.lastgroup
+            if kind == "open":
+                stack.append([])
+            elif kind == "close" and len(stack) > 1:
+                items = stack.pop()
+                stack[-1].append(items)
+            elif kind == "quoted":
+                stack[-1].append(re.sub(rb"\\(.)", rb"\1", match.group(kind)).decode("utf-8", "replace"))
+            elif kind == "atom":
+                atom = match.group(kind).decode("utf-8", "replace")
+                stack[-1].append(None if atom == "NIL" else atom)
+
+        if literal is not None:
+            stack[-1].append(literal)
+
+    while len(stack) > 1:  # unbalanced response, keep what was parsed
+        items = stack.pop()
+        stack[-1].append(items)
+
+    return stack[0]
+
+
+class AsyncIMAP4SSL:
+    line_limit = 1024 * 1024
+
+    def __init__(self, host: str, port: int = 993, *, timeout: float = None, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl._create_unverified_context()
+
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+        self.tags = itertools.count(1)
+        self.lock = asyncio.Lock()  # one command at time per connection
+        self.capabilities: Tuple[str, ...] = ()
+
+    async def _open_connection(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl_context, server_hostname=self.host, limit=self.line_limit
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(self._open_connection(), self.timeout)
+
+        greeting = response_head(await asyncio.wait_for(self.read_response(), self.timeout))
+        if not greeting.startswith((b"* OK", b"* PREAUTH")):
+            await self.close()
+            raise IMAP4Error(f"Unexpected greeting: {greeting.decode(errors='replace')}")
+
+        await self.capability()
+        return self
+
+    async def readline(self) -> bytes:
+        try:
+            line = await self.reader.readuntil(b"\r\n")
+        except asyncio.IncompleteReadError:
+            raise IMAP4Error(f"{self.host} closed connection")
+        return line[:-2]
+
+    async def read_response(self) -> Response:
+        response = []
+
+        line = await self.readline()
+        while match := LITERAL_RE.search(line):
+            try:
+                literal = await self.reader.readexactly(int(match.group(1)))
+            except asyncio.IncompleteReadError:
+                raise IMAP4Error(f"{self.host} closed connection")
+            response.append((line, literal))
+            line = await self.readline()
+
+        response.append(line)
+        return response
+
+    async def send(self, line: str):
+        self.writer.write(line.encode("utf-8") + b"\r\n")
+        await self.writer.drain()
+
+    async def command(self, name: str, *args: str) -> List[Response]:
+        # returns untagged responses, raises IMAP4Error unless command completed with OK
+        if not self.connected:
+            raise IMAP4Error(f"{self.host} is not connected")
+
+        async with self.lock:
+            tag = f"A{next(self.tags):04d}"
+            await self.send(" ".join((tag, name) + args))
+
+            untagged = []
+            while True:
+                response = await asyncio.wait_for(self.read_response(), self.timeout)
+                head = response_head(response)
+
+                if head.startswith(f"{tag} ".encode()):
+                    status, _, text = head[len(tag) + 1:].partition(b" ")
+                    if status != b"OK":
+                        raise IMAP4Error(f"{name} failed: {text.decode(errors='replace')}")
+                    return untagged
+
+                untagged.append(response)
+
+    @staticmethod
+    def untagged(responses: List[Response], kind: str) -> List[list]:
+        # parsed untagged responses of kind, like LIST or FETCH, without "*" and message number
+        result = []
+
+        for response in responses:
+            items = parse_response(response)
+            if len(items) > 1 and items[1] == kind:
+                result.append(items[2:])
+            elif len(items) > 2 and items[2] == kind:
+                result.append(items[3:])
+
+        return result
+
+    async def capability(self) -> Tuple[str, ...]:
+        for items in self.untagged(await self.command("CAPABILITY"), "CAPABILITY"):
+            self.capabilities = tuple(item.upper() for item in items if isinstance(item, str))
+        return self.capabilities
+
+    async def login(self, username: str, password: str):
+        await self.command("LOGIN", quote(username), quote(password))
+        # servers may announce more capabilities after login
+        await self.capability()
+
+    async def list_mailboxes(self, reference: str = "", pattern: str = "*") -> List[list]:
+        return self.untagged(await self.command("LIST", quote(reference), quote(pattern)), "LIST")
+
+    async def select(self, mailbox: str, readonly: bool = False) -> List[Response]:
+        return await self.command("EXAMINE" if readonly else "SELECT", mailbox)
+
+    async def uid_search(self, criteria: str) -> List[str]:
+        args = (criteria,) if criteria.isascii() else ("CHARSET", "UTF-8", criteria)
+
+        uids = []
+        for items in self.untagged(await self.command("UID", "SEARCH", *args), "SEARCH"):
+            uids.extend(item for item in items if isinstance(item, str))
+
+        return uids
+
+    async def uid_fetch(self, uids: str, parts: str) -> List[Response]:
+        return [response for response in await self.command("UID", "FETCH", uids, parts)
+                if b" FETCH " in response_head(response)]
+
+    async def idle(self, timeout: float) -> bool:
+        # waits in IDLE till server reports new mail in selected mailbox, True if it did before timeout
+        async with self.lock:
+            tag = f"A{next(self.tags):04d}"
+            await self.send(f"{tag} IDLE")
+
+            head = response_head(await asyncio.wait_for(self.read_response(), self.timeout))
+            if not head.startswith(b"+"):
+                raise IMAP4Error(f"IDLE failed: {head.decode(errors='replace')}")
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            new_mail = False
+
+            try:
+                while (remaining := deadline - loop.time()) > 0:
+                    try:
+                        head = response_head(await asyncio.wait_for(self.read_response(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                    if head.endswith((b" EXISTS", b" RECENT")):
+                        new_mail = True
+                        break
+            finally:
+                await self.send("DONE")
+                while not response_head(await asyncio.wait_for(self.read_response(), self.timeout)).startswith(
+                        f"{tag} ".encode()):
+                    pass
+
+            return new_mail
+
+    async def noop(self):
+        await self.command("NOOP")
+
+    async def close(self):
+        if self.writer is None:
+            return
+
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+        self.writer = None
+
+    async def logout(self):
+        try:
+            if self.connected:
+                await self.command("LOGOUT")
+        except (IMAP4Error, OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            await self.close()
@@ -1,12 +1,14 @@
 import time
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict, List, Set, Tuple
 
 from imap_tools import AND #, MailBox
 from loguru import logger
 
-from core.utils.mail.mailbox import MailBox
+from core.utils.mail.mailbox import AsyncMailBox, MailBox, MailHeaders
+from core.utils.mail.pool import mailbox_pool
 from data.config import settings
 
 class MailUtils:
@@ -19,6 +21,7 @@ class MailUtils:
         self.domain: str = settings.IMAP_DOMAIN or self.parse_domain()
 
         self.proxy = proxy if settings.USE_PROXY_FOR_IMAP else None
+        self.timeout: int = 30  # seconds per IMAP command
 
     def parse_domain(self) -> str:
         domain: str = self.email.split("@")[-1]
@@ -44,6 +47,29 @@ class MailUtils:
 
         return f"imap.{domain}"
 
+    @property
+    def email_folders(self) -> List[str]:
+        if settings.EMAIL_FOLDER:
+            return [settings.EMAIL_FOLDER]
+        return ["INBOX", "Junk", "JUNK", "Spam", "SPAM", "TRASH", "Trash"]
+
+    async def login_async(self) -> AsyncMailBox:
+        return await AsyncMailBox(self.domain, proxy=self.proxy, timeout=self.timeout).login(
+            self.email, self.imap_pass, initial_folder=None
+        )
+
+    @asynccontextmanager
+    async def mailbox_session(self) -> AsyncIterator[Tuple[AsyncMailBox, List[str]]]:
+        # pooled logged in mailbox and folders of email_folders which exist in it
+        key = (self.domain, self.email.lower())
+
+        async with mailbox_pool.session(key, self.login_async) as mailbox:
+            if (actual_folders := mailbox_pool.folders.get(key)) is None:
+                actual_folders = [folder.name for folder in await mailbox.folder_list()]
+                mailbox_pool.folders[key] = actual_folders
+
+            yield mailbox, [folder for folder in self.email_folders if folder in actual_folders]
+
     def get_msg(
             self,
             to: Optional[str] = None,
@@ -56,10 +82,7 @@ class MailUtils:
     ) -> Dict[str, any]:
 
 
-        if settings.EMAIL_FOLDER:
-            email_folders = [settings.EMAIL_FOLDER]
-        else:
-            email_folders = ["INBOX", "Junk", "JUNK", "Spam", "SPAM", "TRASH", "Trash"]
+        email_folders = self.email_folders
 
         with MailBox(
                 self.domain,
@@ -99,8 +122,206 @@ class MailUtils:
             reverse: bool = True,
             delay: int = 60
     ) -> Dict[str, any]:
-        return await asyncio.to_thread(self.get_msg, to, subject, from_, seen, limit, reverse, delay)
+        # same as get_msg, but waits on event loop instead of thread, so hundreds of mailboxes can be polled at once
+        if settings.SINGLE_IMAP_ACCOUNT and to:
+            return await SharedMailPoller.get(self).wait_for(to, subject, delay)
+
+        async with self.mailbox_session() as (mailbox, folders):
+            watcher = MailWatcher(mailbox, folders)
+            criteria = AND(subject=subject, to=to, from_=from_, seen=seen)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + delay
+
+            while loop.time() < deadline:
+                try:
+                    for folder in folders:
+                        uids = await watcher.search(folder, criteria)
+                        uids = uids[::-1] if reverse else uids
+
+                        # headers first, then only the body part with link
+                        for headers in await mailbox.fetch_headers(uids[:limit] if limit else uids):
+                            if (text := await mailbox.fetch_text(headers)) is None:
+                                continue
+
+                            logger.success(f'{self.email} | Successfully found new msg by subject: {headers.subject}')
+                            return found_message(headers, text)
+
+                    await watcher.wait(deadline - loop.time())
+                except Exception as error:
+                    logger.error(f'{self.email} | Error when fetching new message by subject: {str(error)}')
+                    await asyncio.sleep(3)
+
+        return {"success": False, "msg": "New message not found by subject"}
+
+
+def found_message(headers: MailHeaders, text: str) -> Dict[str, any]:
+    return {
+        "success": True,
+        "msg": text,
+        "subject": headers.subject,
+        "from": headers.from_,
+        "to": headers.to
+    }
+
+
+class MailWatcher:
+    """
+    After first full search only mails newer than last check are searched in folder.
+    Between checks waits in IDLE, or polls with growing interval if server has no IDLE
+    """
+    def __init__(self, mailbox: AsyncMailBox, folders: List[str], min_interval: float = 1, max_interval: float = 5):
+        self.mailbox = mailbox
+        self.folders = folders
+
+        self.interval = min_interval
+        self.max_interval = max_interval
+
+        # (folder, criteria) -> (uidvalidity, last checked uid)
+        self.checked: Dict[Tuple[str, str], Tuple[Optional[int], int]] = {}
+
+    async def search(self, folder: str, criteria: AND | str) -> List[str]:
+        status = await self.mailbox.folder_set(folder)
+        key = (folder, str(criteria))
+
+        uidvalidity, last_uid = self.checked.get(key, (None, 0))
+        if uidvalidity != status.get("UIDVALIDITY"):
+            last_uid = 0  # uids of folder were reassigned
+
+        query = f"UID {last_uid + 1}:* {criteria}" if last_uid else str(criteria)
+        # n:* always matches the last message, even if its uid is below n
+        uids = [uid for uid in await self.mailbox.uids(query) if int(uid) > last_uid]
+
+        if "UIDNEXT" in status:
+            last_uid = status["UIDNEXT"] - 1
+        elif uids:
+            last_uid = max(int(uid) for uid in uids)
+        self.checked[key] = (status.get("UIDVALIDITY"), last_uid)
+
+        return uids
+
+    async def wait(self, timeout: float):
+        if timeout <= 0:
+            return
+
+        if self.mailbox.idle_supported and self.folders:
+            # IDLE watches one folder, others are still checked by interval
+            if len(self.folders) > 1:
+                timeout = min(timeout, self.interval)
+            if self.mailbox.selected_folder != self.folders[0]:
+                await self.mailbox.folder_set(self.folders[0])
+            await self.mailbox.idle(min(timeout, 25 * 60))
+        else:
+            await asyncio.sleep(min(timeout, self.interval))
+
+        self.interval = min(self.interval * 1.5, self.max_interval)
+
+
+class SharedMailPoller:
+    """
+    Single IMAP connection for SINGLE_IMAP_ACCOUNT: new mails are fetched once per cycle
+    and handed to accounts waiting for them by recipient, instead of every account logging into same inbox
+    """
+    instance: Optional["SharedMailPoller"] = None
+
+    def __init__(self, mail_utils: MailUtils, interval: int = 3, batch_delay: float = 0.5):
+        self.mail_utils = mail_utils
+        self.interval = interval
+        self.batch_delay = batch_delay
+
+        # (recipient, subject) -> futures of accounts waiting for that mail
+        self.waiters: Dict[Tuple[str, str], List[asyncio.Future]] = {}
+        # newest mail per (recipient, subject) nobody waited for yet, it may come before account starts waiting.
+        # Only headers are kept, body is fetched when somebody asks for it
+        self.unclaimed: Dict[Tuple[str, str], Tuple[str, MailHeaders]] = {}
+        # folder -> uids already fetched, so reconnect doesn't fetch them again
+        self.seen: Dict[str, Set[str]] = {}
+
+        self.task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def get(cls, mail_utils: MailUtils) -> "SharedMailPoller":
+        if cls.instance is None:
+            cls.instance = cls(mail_utils)
+        return cls.instance
+
+    async def wait_for(self, to: str, subject: str, timeout: float = 60) -> Dict[str, any]:
+        key = (to.lower(), subject or "")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(key, []).append(future)
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return {"success": False, "msg": "New message not found by subject"}
+        finally:
+            if future in (futures := self.waiters.get(key, [])):
+                futures.remove(future)
+                if not futures:
+                    self.waiters.pop(key)
+
+    async def run(self):
+        # lives while somebody waits, reconnects on errors
+        while self.waiters:
+            try:
+                async with self.mail_utils.mailbox_session() as (mailbox, folders):
+                    watcher = MailWatcher(mailbox, folders, max_interval=self.interval)
+                    while self.waiters:
+                        await self.poll(watcher)
+                        await watcher.wait(self.interval)
+                        # IDLE wakes on every mail, batch ones which come together into one fetch
+                        await asyncio.sleep(self.batch_delay)
+            except Exception as error:
+                logger.error(f'{self.mail_utils.email} | Shared mailbox poll error: {str(error)}')
+                await asyncio.sleep(self.interval)
+
+    async def poll(self, watcher: MailWatcher):
+        subjects = {subject for _, subject in self.waiters}
+        found = {key: self.unclaimed[key] for key in self.waiters if key in self.unclaimed}
+
+        for folder in watcher.folders:
+            seen = self.seen.setdefault(folder, set())
+
+            uids = set()
+            for subject in subjects:
+                uids.update(await watcher.search(folder, AND(subject=subject) if subject else "ALL"))
+
+            if not (new_uids := sorted(uids - seen, key=int)):
+                continue
+
+            for headers in await watcher.mailbox.fetch_headers(new_uids):
+                for recipient in headers.to:
+                    for subject in subjects:
+                        if subject.lower() in headers.subject.lower():
+                            found[(recipient, subject)] = (folder, headers)
+            seen.update(new_uids)
+
+        # bodies are fetched only for mails somebody waits for, one command per folder
+        by_folder: Dict[str, Dict[Tuple[str, str], MailHeaders]] = {}
+        for key, (folder, headers) in found.items():
+            if key in self.waiters:
+                by_folder.setdefault(folder, {})[key] = headers
+            else:
+                self.unclaimed[key] = (folder, headers)
+
+        for folder, wanted in by_folder.items():
+            if watcher.mailbox.selected_folder != folder:
+                await watcher.mailbox.folder_set(folder)
+            texts = await watcher.mailbox.fetch_texts(list({headers.uid: headers for headers in wanted.values()}.values()))
+
+            for key, headers in wanted.items():
+                if (text := texts.get(headers.uid)) is None:
+                    continue
 
+                self.unclaimed.pop(key, None)
+                logger.success(f'{key[0]} | Successfully found new msg by subject: {headers.subject}')
+                for future in self.waiters.pop(key, []):
+                    if not future.done():
+                        future.set_result(found_message(headers, text))
 
 # if __name__ == '__main__':
 #     email = ""
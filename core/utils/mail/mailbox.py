@@ -1,21 +1,100 @@
+import binascii
+import html
 import re
 from datetime import datetime
-from typing import Iterator, Sequence
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses, parseaddr
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from imaplib import IMAP4_SSL
 from better_proxy import Proxy
-from bs4 import BeautifulSoup
 from imap_tools import AND, MailMessage, MailBox as BaseMailBox
+from imap_tools.folder import FolderInfo
+from imap_tools.imap_utf7 import utf7_decode, utf7_encode
 
-from .proxy import IMAP4SSlProxy
+from .aioimap import AsyncIMAP4SSL, parse_response, quote
+from .proxy import AsyncIMAP4SSlProxy, IMAP4SSlProxy
+
+
+HTML_TAG_RE = re.compile(r"<(script|style)\b.*?</\1\s*>|<[^>]*>", re.IGNORECASE | re.DOTALL)
+HEADER_FIELDS = ("SUBJECT", "FROM", "TO")
+
+
+def html_to_text(value: str) -> str:
+    # enough to search links and codes in mail, no need in full html parser
+    return html.unescape(HTML_TAG_RE.sub("", value))
 
 
 def get_message_text(mail_message: MailMessage) -> str:
     if mail_message.text:
         return mail_message.text
     else:
-        soup = BeautifulSoup(mail_message.html, 'html.parser')
-        return soup.get_text()
+        return html_to_text(mail_message.html)
+
+
+def decode_header_value(value: str) -> str:
+    try:
+        return str(make_header(decode_header(value)))
+    except (UnicodeDecodeError, LookupError, ValueError):
+        return value
+
+
+def body_parts(structure: list, section: str = "") -> Iterator[Tuple[str, str, Dict[str, str], str]]:
+    # BODYSTRUCTURE -> (section, content type, params, transfer encoding) of every leaf part
+    if structure and isinstance(structure[0], list):
+        index = 0
+        while index < len(structure) and isinstance(structure[index], list):
+            index += 1
+            yield from body_parts(structure[index - 1], f"{section}.{index}" if section else str(index))
+        return
+
+    if len(structure) < 6 or not isinstance(structure[0], str):
+        return
+
+    params = structure[2] if isinstance(structure[2], list) else []
+    params = {str(key).lower(): value for key, value in zip(params[::2], params[1::2])}
+    content_type = f"{structure[0]}/{structure[1]}".lower()
+
+    yield section or "1", content_type, params, str(structure[5] or "7bit").lower()
+
+
+def decode_part(data: bytes, encoding: str, charset: Optional[str]) -> str:
+    if encoding == "base64":
+        data = binascii.a2b_base64(data)
+    elif encoding == "quoted-printable":
+        data = binascii.a2b_qp(data)
+
+    try:
+        return data.decode(charset or "utf-8", "replace")
+    except LookupError:
+        return data.decode("utf-8", "replace")
+
+
+class MailHeaders:
+    """
+    Subject, sender, recipients and body structure of message, fetched without the body itself
+    """
+    __slots__ = ("uid", "subject", "from_", "to", "parts")
+
+    def __init__(self, uid: str, header_data: bytes, structure: list):
+        headers = BytesHeaderParser().parsebytes(header_data)
+
+        self.uid = uid
+        self.subject: str = decode_header_value(headers.get("Subject", "")).strip()
+        self.from_: str = parseaddr(headers.get("From", ""))[1].lower()
+        self.to: Tuple[str, ...] = tuple(
+            address.lower() for _, address in getaddresses(headers.get_all("To", [])) if address
+        )
+        self.parts = list(body_parts(structure)) if isinstance(structure, list) else []
+
+    def find_part(self, *content_types: str) -> Optional[Tuple[str, str, Dict[str, str], str]]:
+        # first part of most preferred content type
+        for content_type in content_types:
+            for part in self.parts:
+                if part[1] == content_type:
+                    return part
+        return None
 
 
 class MailBox(BaseMailBox):
@@ -120,3 +199,239 @@ class MailBox(BaseMailBox):
                 matches.append((message, found[0]))
 
         return matches
+
+
+class AsyncMailBox:
+    """
+    asyncio counterpart of MailBox, connection waits for server without holding a thread
+    """
+    def __init__(
+        self,
+        host: str,
+        *,
+        proxy: Proxy | str = None,
+        port: int = 993,
+        timeout: float = None,
+        rdns: bool = True,
+        ssl_context=None,
+    ):
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._proxy = Proxy.from_str(proxy) if proxy else None
+        self._rdns = rdns
+        self._ssl_context = ssl_context
+
+        self.client = self._get_mailbox_client()
+        self.selected_folder: str | None = None
+
+    def _get_mailbox_client(self):
+        if self._proxy:
+            return AsyncIMAP4SSlProxy(
+                self._host,
+                self._proxy,
+                port=self._port,
+                rdns=self._rdns,
+                timeout=self._timeout,
+                ssl_context=self._ssl_context,
+            )
+        else:
+            return AsyncIMAP4SSL(
+                self._host,
+                port=self._port,
+                timeout=self._timeout,
+                ssl_context=self._ssl_context,
+            )
+
+    async def login(self, username: str, password: str, initial_folder: str | None = 'INBOX'):
+        if self._host == "imap.rambler.ru" and "%" in password:
+            raise ValueError(
+                f"IMAP password contains '%' character. Change your password."
+                f" It's a specific rambler.ru error"
+            )
+
+        await self.client.connect()
+        try:
+            await self.client.login(username, password)
+            if initial_folder is not None:
+                await self.folder_set(initial_folder)
+        except BaseException:
+            await self.client.close()
+            raise
+
+        return self
+
+    async def logout(self):
+        await self.client.logout()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.logout()
+
+    async def folder_list(self) -> List[FolderInfo]:
+        folders = []
+
+        for flags, delim, name in (items[:3] for items in await self.client.list_mailboxes() if len(items) >= 3):
+            name = name if isinstance(name, bytes) else name.encode()
+            folders.append(FolderInfo(utf7_decode(name), delim, tuple(flags or ())))
+
+        return folders
+
+    async def folder_set(self, folder: str) -> Dict[str, int]:
+        # selects folder, returns its status reported by server, like EXISTS, UIDNEXT, UIDVALIDITY
+        status = {}
+
+        responses = await self.client.select(quote(utf7_encode(folder).decode()))
+        self.selected_folder = folder
+
+        for response in responses:
+            items = parse_response(response)
+            if len(items) > 2 and items[2] == "EXISTS" and str(items[1]).isdigit():
+                status["EXISTS"] = int(items[1])
+            elif len(items) > 3 and items[1] == "OK" and items[2] in ("UIDNEXT", "UIDVALIDITY") and items[3].isdigit():
+                # * OK [UIDNEXT 4392] Predicted next UID
+                status[items[2]] = int(items[3])
+
+        return status
+
+    @property
+    def idle_supported(self) -> bool:
+        return "IDLE" in self.client.capabilities
+
+    async def idle(self, timeout: float) -> bool:
+        return await self.client.idle(timeout)
+
+    async def uids(self, criteria: str | AND = 'ALL') -> List[str]:
+        return await self.client.uid_search(str(criteria))
+
+    async def fetch(
+            self,
+            criteria: str | AND = 'ALL',
+            limit: int = None,
+            reverse: bool = False,
+    ) -> List[MailMessage]:
+        uids = await self.uids(criteria)
+        uids = uids[::-1] if reverse else uids
+        uids = uids[:limit] if limit else uids
+
+        return await self.fetch_by_uids(uids)
+
+    async def fetch_by_uids(self, uids: Sequence[str]) -> List[MailMessage]:
+        if not uids:
+            return []
+
+        messages = {}
+        for response in await self.client.uid_fetch(",".join(uids), "(BODY[] UID FLAGS RFC822.SIZE)"):
+            message = MailMessage(response)
+            messages[message.uid] = message
+
+        return [messages[uid] for uid in uids if uid in messages]
+
+    async def _fetch_items(self, uids: Sequence[str], parts: str) -> List[Dict[str, any]]:
+        # FETCH data items of every message, like {"UID": "42", "BODYSTRUCTURE": [...]}
+        items = []
+
+        for data in self.client.untagged(await self.client.uid_fetch(",".join(uids), parts), "FETCH"):
+            data = data[0] if data and isinstance(data[0], list) else []
+            items.append({str(key): value for key, value in zip(data[::2], data[1::2])})
+
+        return items
+
+    async def fetch_headers(self, uids: Sequence[str]) -> List[MailHeaders]:
+        # headers and body structure only, a few hundred bytes per message instead of whole message
+        if not uids:
+            return []
+
+        headers = {}
+        parts = f"(UID BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})] BODYSTRUCTURE)"
+
+        for data in await self._fetch_items(uids, parts):
+            header_data = next((value for key, value in data.items()
+                                if key.startswith("BODY[HEADER") and isinstance(value, bytes)), b"")
+            if uid := data.get("UID"):
+                headers[uid] = MailHeaders(uid, header_data, data.get("BODYSTRUCTURE"))
+
+        return [headers[uid] for uid in uids if uid in headers]
+
+    async def fetch_texts(self, headers: Sequence[MailHeaders], *content_types: str) -> Dict[str, str]:
+        # uid -> decoded body part of first found content type, html is preferred like MailMessage.html.
+        # Messages with same part section are fetched in one command
+        wanted: Dict[str, Dict[str, Tuple[str, str, Dict[str, str], str]]] = {}
+
+        for item in headers:
+            if part := item.find_part(*(content_types or ("text/html", "text/plain"))):
+                wanted.setdefault(part[0], {})[item.uid] = part
+
+        texts = {}
+        for section, parts in wanted.items():
+            for data in await self._fetch_items(list(parts), f"(UID BODY.PEEK[{section}])"):
+                value = data.get(f"BODY[{section}]")
+                if (part := parts.get(data.get("UID"))) and isinstance(value, (bytes, str)):
+                    value = value if isinstance(value, bytes) else value.encode()
+                    texts[data["UID"]] = decode_part(value, part[3], part[2].get("charset"))
+
+        return texts
+
+    async def fetch_text(self, headers: MailHeaders, *content_types: str) -> Optional[str]:
+        return (await self.fetch_texts([headers], *content_types)).get(headers.uid)
+
+    async def fetch_messages(
+            self,
+            folders: Sequence[str] = ("INBOX", ),
+            *,
+            since: datetime = None,
+            allowed_senders: Sequence[str] = None,
+            allowed_receivers: Sequence[str] = None,
+            sender_regex: str | re.Pattern[str] = None,
+            limit: int = 10,
+            reverse: bool = True,
+    ) -> AsyncIterator[MailMessage]:
+        for folder in folders:
+            await self.folder_set(folder)
+
+            criteria = AND(
+                date_gte=since.date() if since else None,
+                from_=allowed_senders if allowed_senders else None,
+                to=allowed_receivers if allowed_receivers else None,
+                all=True
+            )
+
+            for message in await self.fetch(criteria, limit=limit, reverse=reverse):
+                if since and message.date < since:
+                    continue
+
+                if sender_regex and not re.search(sender_regex, message.from_, re.IGNORECASE):
+                    continue
+
+                yield message
+
+    async def search_matches(
+        self,
+        regex: str | re.Pattern[str],
+        folders: Sequence[str] = ("INBOX", ),
+        *,
+        since: datetime = None,
+        allowed_senders: Sequence[str] = None,
+        allowed_receivers: Sequence[str] = None,
+        sender_regex: str | re.Pattern[str] = None,
+        limit: int = 10,
+        reverse: bool = True,
+    ) -> list[tuple[MailMessage, str]]:
+        matches = []
+        messages = self.fetch_messages(
+            folders,
+            since=since,
+            allowed_senders=allowed_senders,
+            allowed_receivers=allowed_receivers,
+            sender_regex=sender_regex,
+            limit=limit,
+            reverse=reverse,
+        )
+
+        async for message in messages:
+            if found := re.findall(regex, get_message_text(message)):
+                matches.append((message, found[0]))
+
+        return matches
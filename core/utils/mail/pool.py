@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .aioimap import IMAP4Error
+from .mailbox import AsyncMailBox
+
+
+class MailboxPool:
+    """
+    Logged in mailboxes by (server, user), so following lookups in same mailbox skip TLS, proxy and LOGIN.
+    Mailbox serves one lookup at time, unused ones are logged out after idle_timeout
+    """
+    def __init__(self, idle_timeout: float = 120):
+        self.idle_timeout = idle_timeout
+
+        # (server, user) -> [(mailbox, released at)]
+        self.idle: Dict[Tuple[str, str], List[Tuple[AsyncMailBox, float]]] = {}
+        # (server, user) -> names of all folders in mailbox
+        self.folders: Dict[Tuple[str, str], List[str]] = {}
+
+        self.reaper: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def session(self, key: Tuple[str, str],
+                      login: Callable[[], Awaitable[AsyncMailBox]]) -> AsyncIterator[AsyncMailBox]:
+        mailbox = await self.take(key) or await login()
+
+        try:
+            yield mailbox
+        except BaseException:
+            # state of connection is unknown, don't give it to next lookup
+            await mailbox.logout()
+            raise
+
+        self.put(key, mailbox)
+
+    async def take(self, key: Tuple[str, str]) -> Optional[AsyncMailBox]:
+        sessions = self.idle.get(key, [])
+
+        while sessions:
+            mailbox, _ = sessions.pop()
+            try:
+                await mailbox.client.noop()
+                return mailbox
+            except (IMAP4Error, OSError, asyncio.TimeoutError):
+                await mailbox.client.close()
+
+        return None
+
+    def put(self, key: Tuple[str, str], mailbox: AsyncMailBox):
+        if not mailbox.client.connected:
+            return
+
+        self.idle.setdefault(key, []).append((mailbox, asyncio.get_running_loop().time()))
+
+        if self.reaper is None or self.reaper.done():
+            self.reaper = asyncio.create_task(self.reap())
+
+    async def reap(self):
+        while self.idle:
+            await asyncio.sleep(self.idle_timeout / 4)
+
+            expired_before = asyncio.get_running_loop().time() - self.idle_timeout
+            expired = []
+
+            for key, sessions in list(self.idle.items()):
+                expired.extend(mailbox for mailbox, released_at in sessions if released_at <= expired_before)
+                if not (sessions := [session for session in sessions if session[1] > expired_before]):
+                    self.idle.pop(key)
+                else:
+                    self.idle[key] = sessions
+
+            await asyncio.gather(*(mailbox.logout() for mailbox in expired), return_exceptions=True)
+
+    async def close(self):
+        if self.reaper:
+            self.reaper.cancel()
+
+        sessions = [mailbox for sessions in self.idle.values() for mailbox, _ in sessions]
+        self.idle.clear()
+
+        await asyncio.gather(*(mailbox.logout() for mailbox in sessions), return_exceptions=True)
+
+
+mailbox_pool = MailboxPool()
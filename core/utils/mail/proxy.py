@@ -1,13 +1,17 @@
 """
 MailBox traffic through proxy servers using https://github.com/romis2012/python-socks
 """
+import asyncio
 import ssl
 from imaplib import IMAP4
 
 from better_proxy import Proxy
+from python_socks.async_.asyncio import Proxy as AsyncProxy
 from python_socks.sync import Proxy as SyncProxy
 from python_socks import ProxyError, ProxyTimeoutError, ProxyConnectionError
 
+from .aioimap import AsyncIMAP4SSL
+
 
 MAILBOX_PROXY_ERRORS = (
     ProxyError,
@@ -54,3 +58,25 @@ class IMAP4SSlProxy(IMAP4Proxy):
         sock = super()._create_socket(timeout)
         server_hostname = self.host if ssl.HAS_SNI else None
         return self.ssl_context.wrap_socket(sock, server_hostname=server_hostname)
+
+
+class AsyncIMAP4SSlProxy(AsyncIMAP4SSL):
+    def __init__(
+            self,
+            host: str,
+            proxy: Proxy,
+            *,
+            port: int = 993,
+            rdns: bool = True,
+            ssl_context=None,
+            timeout: float = None,
+    ):
+        self._proxy = proxy
+        self._async_proxy = AsyncProxy.from_url(self._proxy.as_url, rdns=rdns)
+        super().__init__(host, port, timeout=timeout, ssl_context=ssl_context)
+
+    async def _open_connection(self):
+        sock = await self._async_proxy.connect(self.host, self.port, self.timeout)
+        return await asyncio.open_connection(
+            sock=sock, ssl=self.ssl_context, server_hostname=self.host, limit=self.line_limit
+        )
@@ -0,0 +1,123 @@
+import asyncio
+import heapq
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.utils import logger
+from core.utils.rate_limiter import TokenBucket
+from core.utils.reconnect import ReconnectStats
+from core.utils.traffic import TrafficMeter
+
+
+class PointsCollector:
+    """
+    Points of all accounts are fetched here, apart from mining loops, so slow or failing REST call
+    never delays ping of account. Requests go at fleet-wide rate with jitter, one per email at time,
+    results are written to db in batches
+    """
+    def __init__(self, db, interval: float = 3600, rate: float = 2, jitter: float = 0.1,
+                 concurrency: int = 5, flush_every: int = 50, flush_interval: float = 60):
+        self.db = db
+        self.interval = interval  # seconds between checks of one account
+        self.jitter = jitter  # +-share of interval, so checks of accounts started together spread out
+        self.budget = TokenBucket(rate, 1)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        # email -> account (Grass) that mines with it, newest one wins
+        self.accounts: Dict[str, object] = {}
+        # (due time, email), one entry per email
+        self.schedule: List[Tuple[float, str]] = []
+        self.scheduled: Set[str] = set()
+
+        # (account id, email, points) waiting to be written
+        self.pending: List[Tuple[int, str, str]] = []
+        self.tasks: Set[asyncio.Task] = set()
+        self.wakeup: Optional[asyncio.Event] = None
+
+    def add(self, account):
+        # several accounts with same email are coalesced into one check
+        self.accounts[account.email] = account
+
+        if account.email not in self.scheduled:
+            self.schedule_check(account.email, 0)
+
+    def schedule_check(self, email: str, delay: float):
+        self.scheduled.add(email)
+        heapq.heappush(self.schedule, (asyncio.get_running_loop().time() + delay, email))
+
+        if self.wakeup:
+            self.wakeup.set()
+
+    def next_delay(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        flushed_at = loop.time()
+
+        try:
+            while True:
+                timeout = self.flush_interval
+                if self.schedule:
+                    timeout = min(timeout, max(self.schedule[0][0] - loop.time(), 0))
+
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                while self.schedule and self.schedule[0][0] <= loop.time():
+                    _, email = heapq.heappop(self.schedule)
+                    await self.budget.acquire(priority=1)
+
+                    task = asyncio.create_task(self.check(email))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+                if len(self.pending) >= self.flush_every or loop.time() - flushed_at >= self.flush_interval:
+                    await self.flush()
+                    flushed_at = loop.time()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await self.flush()
+
+    async def check(self, email: str):
+        account = self.accounts.get(email)
+        if account is None or account.session.closed:
+            # account stopped, its email is not checked anymore
+            self.accounts.pop(email, None)
+            self.scheduled.discard(email)
+            return
+
+        try:
+            async with self.semaphore:
+                points = await account.get_points()
+        except Exception as e:
+            logger.debug(f"{account.id} | {email} | Points check failed: {e}")
+            self.schedule_check(email, self.next_delay(self.interval / 10))
+            return
+
+        self.pending.append((account.id, email, points))
+        logger.info(f"{account.id} | {email} | Total points: {points} | "
+                    f"Proxy traffic: {TrafficMeter.proxy_summary(account.proxy)}")
+
+        self.schedule_check(email, self.next_delay(self.interval))
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        stats, self.pending = self.pending, []
+        try:
+            await self.db.update_point_stats(stats)
+        except Exception as e:
+            logger.warning(f"Points flush failed: {e}")
+            self.pending = stats + self.pending
+            return
+
+        logger.debug(ReconnectStats.summary())
@@ -0,0 +1,59 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import List, Optional, Tuple
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+        # (priority, order, future), lower priority value is served first
+        self.waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self.order = itertools.count()
+        self.dispatcher: Optional[asyncio.Task] = None
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: float = 0):
+        if self.rate <= 0:
+            return
+
+        self.refill()
+        if not self.waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.order), future))
+
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self.dispatch())
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.tokens += 1  # token was granted, but nobody used it
+            raise
+
+    async def dispatch(self):
+        while self.waiters:
+            self.refill()
+
+            while self.tokens >= 1 and self.waiters:
+                _, _, future = heapq.heappop(self.waiters)
+                if not future.done():
+                    future.set_result(None)
+                    self.tokens -= 1
+
+            if self.waiters:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
@@ -0,0 +1,53 @@
+import random
+from collections import deque
+from enum import Enum
+from typing import Deque, Dict
+
+from core.utils import logger
+from core.utils.rate_limiter import TokenBucket
+from data.config import settings
+
+
+class ConnectionState(str, Enum):
+    IDLE = "idle"
+    CONNECTING = "connecting"
+    AUTHENTICATING = "authenticating"
+    MINING = "mining"
+    BACKOFF = "backoff"
+
+
+class ReconnectStats:
+    # seconds from websocket drop till AUTH sent on new socket, all accounts
+    samples: Deque[float] = deque(maxlen=1000)
+    count: int = 0
+    log_every: int = 100
+
+    @classmethod
+    def add(cls, seconds: float):
+        cls.samples.append(seconds)
+        cls.count += 1
+
+        if cls.count % cls.log_every == 0:
+            logger.info(cls.summary())
+
+    @classmethod
+    def percentiles(cls, *percents: float) -> Dict[float, float]:
+        if not cls.samples:
+            return {}
+
+        samples = sorted(cls.samples)
+        return {p: samples[min(len(samples) - 1, int(len(samples) * p / 100))] for p in percents}
+
+    @classmethod
+    def summary(cls) -> str:
+        stats = " | ".join(f"p{p:g} {value:.1f}s" for p, value in cls.percentiles(50, 90, 99).items())
+        return f"Reconnect time: {stats or 'no data'} | {cls.count} reconnects"
+
+
+# shared by all accounts, so after outage sockets come back at steady rate
+reconnect_budget = TokenBucket(settings.RECONNECT_RATE, settings.RECONNECT_BURST)
+
+
+def decorrelated_jitter(previous: float, base: float = 2, cap: float = 120) -> float:
+    # accounts dropped at same moment drift apart instead of retrying in lockstep
+    return min(cap, random.uniform(base, max(base, previous) * 3))
@@ -1,4 +1,7 @@
 
+from core.utils.socks_connector import request_proxy
+
+
 class BaseClient:
     def __init__(self, user_agent: str, proxy: str = None):
         self.session = None
@@ -24,3 +27,7 @@ class BaseClient:
             'sec-fetch-site': 'same-site',
             'user-agent': self.user_agent,
         }
+
+    @property
+    def request_proxy(self):
+        return request_proxy(self.proxy)
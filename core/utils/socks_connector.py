@@ -0,0 +1,51 @@
+"""
+aiohttp connector which tunnels connections through SOCKS4/5 proxy using https://github.com/romis2012/python-socks
+"""
+import socket
+from typing import Optional
+
+import aiohttp
+from python_socks.async_.asyncio import Proxy as AsyncProxy
+
+SOCKS_SCHEMES = ("socks4", "socks4a", "socks5", "socks5h")
+
+
+def is_socks_proxy(proxy: Optional[str]) -> bool:
+    return bool(proxy) and proxy.split("://", 1)[0].lower() in SOCKS_SCHEMES
+
+
+def request_proxy(proxy: Optional[str]) -> Optional[str]:
+    # value for proxy= of aiohttp requests, SOCKS is handled by connector itself
+    return None if is_socks_proxy(proxy) else proxy
+
+
+def create_connector(proxy: Optional[str] = None, **kwargs) -> aiohttp.TCPConnector:
+    if is_socks_proxy(proxy):
+        return SocksConnector(proxy, **kwargs)
+    return aiohttp.TCPConnector(**kwargs)
+
+
+class SocksConnector(aiohttp.TCPConnector):
+    # keep-alive pool of connector holds tunnels through one proxy, so they are reused across requests
+    def __init__(self, proxy_url: str, rdns: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.proxy_url = proxy_url.replace("socks5h://", "socks5://").replace("socks4a://", "socks4://")
+        self.rdns = rdns
+
+    async def _resolve_host(self, host: str, port: int, traces=None):
+        if not self.rdns:
+            return await super()._resolve_host(host, port, traces=traces)
+
+        # host is resolved by proxy
+        return [{"hostname": host, "host": host, "port": port, "family": socket.AF_INET, "proto": 0, "flags": 0}]
+
+    async def _wrap_create_connection(self, *args, addr_infos, req, timeout, client_error=aiohttp.ClientConnectorError,
+                                      **kwargs):
+        proxy = AsyncProxy.from_url(self.proxy_url, rdns=self.rdns)
+
+        try:
+            sock = await proxy.connect(dest_host=req.url.raw_host, dest_port=req.port, timeout=timeout.sock_connect)
+        except Exception as e:
+            raise aiohttp.ClientProxyConnectionError(req.connection_key, OSError(str(e))) from e
+
+        return await self._loop.create_connection(*args, **kwargs, sock=sock)
@@ -0,0 +1,191 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from core.utils import logger
+from core.utils.exception import TrafficLimitExceededException
+
+
+class TrafficMeter:
+    kinds = ("ws", "http_request", "rest")
+
+    # (proxy, kind) -> [bytes_in, bytes_out] for all connections through proxy
+    totals: Dict[Tuple[Optional[str], str], List[int]] = defaultdict(lambda: [0, 0])
+    # email -> [bytes_in, bytes_out] for all connections of account
+    account_totals: Dict[Optional[str], List[int]] = defaultdict(lambda: [0, 0])
+
+    def __init__(self, proxy: str = None, kind: str = "ws", email: str = None):
+        self.proxy = proxy
+        self.kind = kind
+        self.email = email
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add_in(self, size: int):
+        self.bytes_in += size
+        TrafficMeter.totals[(self.proxy, self.kind)][0] += size
+        TrafficMeter.account_totals[self.email][0] += size
+
+    def add_out(self, size: int):
+        self.bytes_out += size
+        TrafficMeter.totals[(self.proxy, self.kind)][1] += size
+        TrafficMeter.account_totals[self.email][1] += size
+
+    @property
+    def total(self) -> int:
+        return self.bytes_in + self.bytes_out
+
+    def __str__(self):
+        return f"{self.kind} in {format_bytes(self.bytes_in)} / out {format_bytes(self.bytes_out)}"
+
+    @classmethod
+    def proxy_total(cls, proxy: str = None) -> Tuple[int, int]:
+        stats = [stat for (stat_proxy, _), stat in cls.totals.items() if stat_proxy == proxy]
+        return sum(stat[0] for stat in stats), sum(stat[1] for stat in stats)
+
+    @classmethod
+    def proxy_summary(cls, proxy: str = None) -> str:
+        return " | ".join(f"{kind} in {format_bytes(stat[0])} / out {format_bytes(stat[1])}"
+                          for (stat_proxy, kind), stat in cls.totals.items() if stat_proxy == proxy)
+
+    @classmethod
+    def scope_total(cls, scope: str, key: str) -> int:
+        if scope == "proxy":
+            return sum(sum(cls.totals[(key, kind)]) for kind in cls.kinds if (key, kind) in cls.totals)
+        return sum(cls.account_totals[key]) if key in cls.account_totals else 0
+
+    @classmethod
+    def usage_snapshot(cls) -> Dict[Tuple[str, str], int]:
+        snapshot = defaultdict(int)
+
+        for (proxy, _), stat in cls.totals.items():
+            if proxy:
+                snapshot[("proxy", proxy)] += sum(stat)
+        for email, stat in cls.account_totals.items():
+            if email:
+                snapshot[("account", email)] += sum(stat)
+
+        return snapshot
+
+
+class TrafficBudget:
+    def __init__(self, db, proxy_limit_mb: int = 0, account_limit_mb: int = 0, period: str = "day"):
+        if period not in ("day", "month"):
+            raise ValueError(f"Unknown TRAFFIC_LIMIT_PERIOD '{period}'. Use day or month")
+
+        self.db = db
+        self.limits = {
+            "proxy": proxy_limit_mb * 1024 * 1024,
+            "account": account_limit_mb * 1024 * 1024,
+        }
+        self.period = period
+
+        self.period_key = self.get_period_key()
+        # bytes used in current period, already flushed to db
+        self.usage: Dict[Tuple[str, str], int] = defaultdict(int)
+        # meter totals seen on last flush
+        self.flushed: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.limits.values())
+
+    def get_period_key(self, now: datetime = None) -> str:
+        now = now or datetime.now()
+        return now.strftime("%Y-%m-%d" if self.period == "day" else "%Y-%m")
+
+    def seconds_until_reset(self) -> float:
+        now = datetime.now()
+
+        if self.period == "day":
+            reset_at = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        else:
+            reset_at = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+
+        return (reset_at - now).total_seconds()
+
+    async def load(self):
+        self.usage = defaultdict(int, await self.db.get_traffic_usage(self.period_key))
+        self.flushed = defaultdict(int, TrafficMeter.usage_snapshot())
+
+    async def flush(self):
+        snapshot = TrafficMeter.usage_snapshot()
+        deltas = {key: total - self.flushed[key] for key, total in snapshot.items() if total > self.flushed[key]}
+        self.flushed = defaultdict(int, snapshot)
+
+        if (period_key := self.get_period_key()) != self.period_key:
+            self.period_key = period_key
+            self.usage = defaultdict(int)
+
+        for key, delta in deltas.items():
+            self.usage[key] += delta
+
+        if deltas:
+            await self.db.add_traffic_usage(self.period_key, deltas)
+
+    async def run_flusher(self, interval: int = 60):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Traffic usage flush failed: {e}")
+
+    def used(self, scope: str, key: str) -> int:
+        unflushed = TrafficMeter.scope_total(scope, key) - self.flushed.get((scope, key), 0)
+        return self.usage[(scope, key)] + max(unflushed, 0)
+
+    def check(self, proxy: str = None, email: str = None):
+        for scope, key in (("proxy", proxy), ("account", email)):
+            if not (limit := self.limits[scope]) or not key:
+                continue
+
+            if (used := self.used(scope, key)) >= limit:
+                raise TrafficLimitExceededException(
+                    f"{scope.capitalize()} {key} used {format_bytes(used)} of {format_bytes(limit)} per {self.period}"
+                )
+
+
+def create_trace_config(get_meter: Callable[[], TrafficMeter]) -> aiohttp.TraceConfig:
+    # meters every request of session: request / response bodies and headers
+    async def on_request_chunk_sent(session, context, params):
+        get_meter().add_out(len(params.chunk))
+
+    async def on_response_chunk_received(session, context, params):
+        get_meter().add_in(len(params.chunk))
+
+    async def on_request_end(session, context, params):
+        meter = get_meter()
+        meter.add_out(len(params.method) + len(str(params.url)) + headers_size(params.headers))
+        meter.add_in(headers_size(params.response.headers))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    trace_config.on_request_end.append(on_request_end)
+
+    return trace_config
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+
+def payload_size(data: str | bytes) -> int:
+    # payload before permessage-deflate, so it is upper bound of what goes through proxy
+    if isinstance(data, str) and not data.isascii():
+        return len(data.encode('utf-8'))
+    return len(data)
+
+
+def headers_size(headers) -> int:
+    # "Name: value\r\n" per header, close enough for accounting
+    return sum(len(str(k)) + len(str(v)) + 4 for k, v in headers.items())
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import base58
+from solders.keypair import Keypair
+
+from core.utils import logger
+
+PROCESS_POOL_MIN_KEYS = 5000  # below that decoding in place is faster than starting processes
+CHUNK_SIZE = 2000
+
+
+class Wallet:
+    """
+    Solana keypair decoded once before accounts start, address and public key are kept
+    so linking wallet only signs message
+    """
+    __slots__ = ("private_key", "keypair", "address", "public_key")
+
+    def __init__(self, private_key: str):
+        self.private_key = private_key
+        # raises ValueError for bad base58, SignatureError when public half doesn't match secret
+        self.keypair = Keypair.from_bytes(base58.b58decode(private_key))
+
+        self.address = str(self.keypair.pubkey())
+        self.public_key = base64.b64encode(bytes(self.keypair.pubkey())).decode('utf-8')
+
+    def sign(self, message: str) -> str:
+        return base64.b64encode(bytes(self.keypair.sign_message(message.encode("utf-8")))).decode('utf-8')
+
+    def __str__(self):
+        return self.address
+
+
+def decode_wallets(keys: List[str]) -> List[Tuple[Optional[Wallet], Optional[str]]]:
+    # (wallet, None) or (None, error) per key, runs in worker processes for big files
+    result = []
+
+    for key in keys:
+        try:
+            result.append((Wallet(key.strip()), None))
+        except Exception as e:
+            result.append((None, str(e) or type(e).__name__))
+
+    return result
+
+
+async def prepare_wallets(keys: List[str]) -> List[Wallet]:
+    # all keys are checked before any account starts, raises ValueError listing malformed ones
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+    if len(keys) < PROCESS_POOL_MIN_KEYS or cpus < 2:
+        decoded = decode_wallets(keys)
+    else:
+        loop = asyncio.get_running_loop()
+        chunks = [keys[i:i + CHUNK_SIZE] for i in range(0, len(keys), CHUNK_SIZE)]
+
+        with ProcessPoolExecutor(min(cpus, len(chunks))) as executor:
+            results = await asyncio.gather(*(loop.run_in_executor(executor, decode_wallets, chunk)
+                                             for chunk in chunks))
+        decoded = [item for result in results for item in result]
+
+    if errors := [f"line {line}: {error}" for line, (_, error) in enumerate(decoded, 1) if error]:
+        raise ValueError(f"{len(errors)} malformed wallet keys | " + " | ".join(errors[:5])
+                         + (" | ..." if len(errors) > 5 else ""))
+
+    logger.info(f"Prepared {len(decoded)} wallets")
+    return [wallet for wallet, _ in decoded]
@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     SEMI_AUTOMATIC_APPROVE_LINK: bool = False # if True - allow to manual paste approve link from email to cli
     # If you have possibility to forward all approve mails to single IMAP address:
     SINGLE_IMAP_ACCOUNT: str = "" # usage "name@domain.com:password"
+    # approve runs in two phases: verification mails are sent for all accounts, then collected from mailboxes
+    APPROVE_SEND_THREADS: int = 20  # accounts logging in and sending verification mails at once
+    APPROVE_HARVEST_THREADS: int = 100  # accounts waiting for verification mail at once
 
     # skip for auto chosen
     EMAIL_FOLDER: str = ""  # folder where mails comes (example: SPAM INBOX JUNK etc.)
@@ -24,23 +27,57 @@ class Settings(BaseSettings):
 
     #########################################
     CLAIM_REWARDS_ONLY: bool = False # claim tiers rewards only (https://app.getgrass.io/dashboard/referral-program)
+    CLAIM_THREADS: int = 50  # accounts claiming at once
+    CLAIM_RATE: float = 5  # claim requests per second for all accounts, 0 - unlimited
+    CLAIM_BURST: int = 10
 
     STOP_ACCOUNTS_WHEN_SITE_IS_DOWN: bool = True  # stop account for 20 minutes, to reduce proxy traffic usage
-    CHECK_POINTS: bool = True  # show point for each account every nearly 10 minutes
+    CHECK_POINTS: bool = True  # show points of each account, checked apart from mining
+    POINTS_INTERVAL: int = 3600  # seconds between points checks of one account
+    POINTS_RATE: float = 2  # points requests per second for all accounts
     SHOW_LOGS_RARELY: bool = False # not always show info about actions to decrease pc influence
 
+    # HTTP_REQUEST jobs served for the network
+    HTTP_REQUEST_THREADS: int = 4  # parallel jobs per connection
+    HTTP_REQUEST_MAX_BODY_SIZE: int = 5 * 1024 * 1024  # bytes, bigger responses are dropped
+    HTTP_REQUEST_TIMEOUT: int = 30  # seconds for whole request
+    HTTP_CACHE_SIZE_MB: int = 64  # shared cache of cacheable GET responses, 0 - disable
+    HTTP_CACHE_MAX_TTL: int = 30  # seconds, response is never cached longer than its max-age
+
+    # Websocket endpoints, the fastest and healthiest one is preferred per proxy
+    WS_ENDPOINTS: list = ["wss://proxy2.wynd.network:4444/", "wss://proxy2.wynd.network:4650/"]
+    WS_ENDPOINT_EXPLORE: float = 0.1  # chance to try random endpoint to keep stats fresh
+
+    # Fleet-wide websocket (re)connect budget, protects from reconnect storm after outage
+    RECONNECT_RATE: float = 20  # connects per second for all accounts, 0 - unlimited
+    RECONNECT_BURST: int = 50
+
+    # Traffic budget, usage is kept in PROXY_DB_PATH and survives restarts
+    PROXY_TRAFFIC_LIMIT_MB: int = 0  # per proxy, 0 - unlimited
+    ACCOUNT_TRAFFIC_LIMIT_MB: int = 0  # per account, 0 - unlimited
+    TRAFFIC_LIMIT_PERIOD: str = "day"  # day, month | accounts over limit are paused until next period
+
+    WS_JSON_CODEC: str = "auto"  # auto, orjson, json | auto - orjson if installed (pip install orjson)
+
     # Mining mode
     MINING_MODE: bool = True  # False - not mine grass, True - mine grass | Remove all True on approve \ register section
 
     # REGISTER PARAMETERS ONLY
     REGISTER_ACCOUNT_ONLY: bool = False
     REGISTER_DELAY: tuple = (3, 7)
+    REGISTER_CAPTCHA_THREADS: int = 20  # captchas solved at once, registrations are sent by THREADS
+    CAPTCHA_POOL_SIZE: tuple = (1, 50)  # min / max tokens solved ahead, actual size follows registration rate
+    CAPTCHA_TOKEN_MAX_AGE: int = 100  # seconds, token is dropped before reCAPTCHA expires it (~120s)
 
     TWO_CAPTCHA_API_KEY: str = ""
     ANTICAPTCHA_API_KEY: str = ""
     CAPMONSTER_API_KEY: str = ""
     CAPSOLVER_API_KEY: str = ""
     CAPTCHAAI_API_KEY: str = ""
+    # with 2+ keys: captcha goes to fastest service, and to second one too if first is slower than usual
+    CAPTCHA_HEDGING: bool = False
+    CAPTCHA_HEDGE_PERCENTILE: int = 90  # second service is asked after this percentile of first one's solve time
+    CAPTCHA_HEDGE_MAX_EXTRA: float = 0.2  # at most 20% more tasks paid because of hedging
 
     # Use proxy also for mail handling
     USE_PROXY_FOR_IMAP: bool = False
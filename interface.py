@@ -60,7 +60,7 @@ async def worker_task(_id, account: str, proxy: str = None, wallet: str = None,
 
     if len(consumables) == 1:
         email = consumables[0]
-        password = Person().random_string(8)
+        password = Person.random_string(8)
     elif len(consumables) == 2:
         email, password = consumables
     else:
@@ -13,11 +13,21 @@ from termcolor import colored, cprint
 from better_proxy import Proxy
 
 from core import Grass
+from core.approver import approve_accounts
 from core.autoreger import AutoReger
+from core.claimer import claim_accounts
+from core.grass_sdk.http_request import HttpRequestEngine
+from core.registrar import register_accounts
 from core.utils import logger, file_to_list
 from core.utils.accounts_db import AccountsDB
+from core.utils.captcha_pool import captcha_pool
+from core.utils.captcha_service import CaptchaService
 from core.utils.exception import EmailApproveLinkNotFoundException, LoginException, RegistrationException
 from core.utils.generate.person import Person
+from core.utils.mail.pool import mailbox_pool
+from core.utils.points import PointsCollector
+from core.utils.traffic import TrafficBudget
+from core.utils.wallet import prepare_wallets
 from data.config import settings
 
 
@@ -42,7 +52,7 @@ async def worker_task(_id, account: str, proxy: str = None, wallet: str = None,
 
     if len(consumables) == 1:
         email = consumables[0]
-        password = Person().random_string(8)
+        password = Person.random_string(8)
     elif len(consumables) == 2:
         email, password = consumables
     else:
@@ -60,43 +70,7 @@ async def worker_task(_id, account: str, proxy: str = None, wallet: str = None,
         
         logger.info(f"Starting #{_id} | {email} | {proxy}")
 
-        if settings.REGISTER_ACCOUNT_ONLY:
-            await grass.create_account()
-        elif settings.APPROVE_EMAIL or settings.CONNECT_WALLET or settings.SEND_WALLET_APPROVE_LINK_TO_EMAIL or settings.APPROVE_WALLET_ON_EMAIL:
-            await grass.enter_account()
-
-            user_info = await grass.retrieve_user()
-
-            if settings.APPROVE_EMAIL:
-                if user_info['result']['data'].get("isVerified"):
-                    logger.info(f"{grass.id} | {grass.email} email already verified!")
-                else:
-                    if settings.SEMI_AUTOMATIC_APPROVE_LINK:
-                        imap_pass = "placeholder"
-                    elif imap_pass is None:
-                        raise TypeError("IMAP password is not provided")
-                    await grass.confirm_email(imap_pass)
-            if settings.CONNECT_WALLET:
-                if user_info['result']['data'].get("walletAddress"):
-                    logger.info(f"{grass.id} | {grass.email} wallet already linked!")
-                else:
-                    await grass.link_wallet(wallet)
-
-            if user_info['result']['data'].get("isWalletAddressVerified"):
-                logger.info(f"{grass.id} | {grass.email} wallet already verified!")
-            else:
-                if settings.SEND_WALLET_APPROVE_LINK_TO_EMAIL:
-                    await grass.send_approve_link(endpoint="sendWalletAddressEmailVerification")
-                if settings.APPROVE_WALLET_ON_EMAIL:
-                    if settings.SEMI_AUTOMATIC_APPROVE_LINK:
-                        imap_pass = "placeholder"
-                    elif imap_pass is None:
-                        raise TypeError("IMAP password is not provided")
-                    await grass.confirm_wallet_by_email(imap_pass)
-        elif settings.CLAIM_REWARDS_ONLY:
-            await grass.claim_rewards()
-        else:
-            await grass.start()
+        await grass.start()
 
         return True
     except (LoginException, RegistrationException) as e:
@@ -126,12 +100,16 @@ async def main():
 
     proxies = [Proxy.from_str(proxy).as_url for proxy in file_to_list(settings.PROXIES_FILE_PATH)]
 
-    #### delete DB if it exists to clean up
-    if os.path.exists(settings.PROXY_DB_PATH):
-        os.remove(settings.PROXY_DB_PATH)
-
     db = AccountsDB(settings.PROXY_DB_PATH)
     await db.connect()
+    #### clean up previous run, traffic usage is kept
+    await db.clear_tables()
+
+    traffic_budget = TrafficBudget(db, settings.PROXY_TRAFFIC_LIMIT_MB, settings.ACCOUNT_TRAFFIC_LIMIT_MB,
+                                   settings.TRAFFIC_LIMIT_PERIOD)
+    await traffic_budget.load()
+    Grass.traffic_budget = traffic_budget
+    flusher = asyncio.create_task(traffic_budget.run_flusher())
 
     for i, account in enumerate(accounts):
         account = account.split(" 🚀 ")[0]
@@ -152,33 +130,66 @@ async def main():
     )
 
     threads = settings.THREADS
+    pipeline_func = None
+    points_task = None
 
     if settings.REGISTER_ACCOUNT_ONLY:
         msg = "__REGISTER__ MODE"
+        # captchas are solved ahead while earlier accounts are being registered
+        pipeline_func = register_accounts
     elif settings.APPROVE_EMAIL or settings.CONNECT_WALLET or settings.SEND_WALLET_APPROVE_LINK_TO_EMAIL or settings.APPROVE_WALLET_ON_EMAIL:
         if settings.CONNECT_WALLET:
-            wallets = file_to_list(settings.WALLETS_FILE_PATH)
+            try:
+                wallets = await prepare_wallets(file_to_list(settings.WALLETS_FILE_PATH))
+            except ValueError as e:
+                logger.error(f"Wallet file: {e}")
+                return
+
             if len(wallets) == 0:
                 logger.error("Wallet file is empty")
                 return
             elif len(wallets) != len(accounts):
                 logger.error("Wallets count != accounts count")
                 return
+
+            # decoded keypairs take place of key strings, so linking only signs
+            autoreger.accounts = [account[:3] + (wallet,) + account[4:]
+                                  for account, wallet in zip(autoreger.accounts, wallets)]
         elif len(accounts[0].split(" 🚀 ")) != 3:
             logger.error("For __APPROVE__ mode: Need to provide email, password and imap password - email 🚀 password 🚀 imap_password")
             return
 
         msg = "__APPROVE__ MODE"
+        # verification mails are sent for all accounts first, then collected
+        pipeline_func = approve_accounts
     elif settings.CLAIM_REWARDS_ONLY:
         msg = "__CLAIM__ MODE"
+        # claims of all accounts run together under one rate limit
+        pipeline_func = claim_accounts
     else:
         msg = "__MINING__ MODE"
         threads = len(autoreger.accounts)
 
-    logger.info(msg)
+        if settings.CHECK_POINTS:
+            Grass.points_collector = PointsCollector(db, settings.POINTS_INTERVAL, settings.POINTS_RATE)
+            points_task = asyncio.create_task(Grass.points_collector.run())
 
-    await autoreger.start(worker_task, threads)
+    logger.info(msg)
 
+    if pipeline_func:
+        await autoreger.start_pipeline(pipeline_func)
+    else:
+        await autoreger.start(worker_task, threads)
+
+    flusher.cancel()
+    if points_task:
+        points_task.cancel()
+        await asyncio.gather(points_task, return_exceptions=True)
+    await traffic_budget.flush()
+    await HttpRequestEngine.close_sessions()
+    await mailbox_pool.close()
+    await captcha_pool.close()
+    await CaptchaService.close_session()
     await db.close_connection()
 
 